@@ -0,0 +1,338 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""microbenchmarks of the hot functions
+
+runs offline against a local sqlite app ( see `local` ), every benchmark is
+timed with `timeit` ( gc disabled ) over several repeats and the results are
+written as json, which `--compare` diffs against an older run
+
+    python3 scripts/bench.py -o new.json --compare old.json"""
+
+import argparse
+import json
+import os
+import platform
+import re
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+import typing as t
+from types import SimpleNamespace
+
+import local
+
+POSTS: t.Final[int] = 64
+
+benchmarks: t.Dict[str, t.Callable[[], t.Callable[[], t.Any]]] = {}
+
+
+def benchmark(
+    name: str,
+) -> t.Callable[
+    [t.Callable[[], t.Callable[[], t.Any]]], t.Callable[[], t.Callable[[], t.Any]]
+]:
+    """register a benchmark, the decorated function sets it up and returns the
+    function to time"""
+
+    def wrap(
+        setup: t.Callable[[], t.Callable[[], t.Any]]
+    ) -> t.Callable[[], t.Callable[[], t.Any]]:
+        benchmarks[name] = setup
+        return setup
+
+    return wrap
+
+
+@benchmark("md.markdown")
+def _() -> t.Callable[[], t.Any]:
+    from a import const, md
+
+    return lambda: md.markdown(const.EXAMPLE_MARKDOWN)
+
+
+@benchmark("md.slugify")
+def _() -> t.Callable[[], t.Any]:
+    from a import md
+
+    return lambda: md.slugify("Hello, world! A rather long title for a blog post")
+
+
+@benchmark("md.get_code_style")
+def _() -> t.Callable[[], t.Any]:
+    from a import const, md
+
+    # the uncached function, the cached one is a dict lookup
+    return lambda: md.get_code_style.__wrapped__(const.CodeTheme.coffee)  # type: ignore
+
+
+@benchmark("models.Counter.to_svg")
+def _() -> t.Callable[[], t.Any]:
+    from a import models
+
+    counter: t.Any = SimpleNamespace(count=1234567890)
+    return lambda: models.Counter.to_svg(counter)
+
+
+@benchmark("web_mini.minify_html")
+def _() -> t.Callable[[], t.Any]:
+    import web_mini
+
+    from a import const, md
+
+    html: str = f"""<!DOCTYPE html>
+<html lang="en">
+    <head>
+        <meta charset="UTF-8" />
+        <title>benchmark</title>
+    </head>
+
+    <body>
+        <article>
+            {md.markdown(const.EXAMPLE_MARKDOWN)}
+        </article>
+    </body>
+</html>"""
+
+    return lambda: web_mini.html.minify_html(html)
+
+
+@benchmark("web_mini.minify_css")
+def _() -> t.Callable[[], t.Any]:
+    from a import const, md
+
+    # the uncached function, as `min_css` is cached
+    css: str = md.get_code_style.__wrapped__(const.CodeTheme.monokai)  # type: ignore
+    return lambda: md.minify_css(css)
+
+
+@benchmark("crypt.encrypt_aes")
+def _() -> t.Callable[[], t.Any]:
+    from a import crypt
+
+    return lambda: crypt.encrypt_aes("hello world " * 16, b"password", b"salt" * 8)
+
+
+@benchmark("crypt.decrypt_aes")
+def _() -> t.Callable[[], t.Any]:
+    from a import crypt
+
+    data: str = crypt.encrypt_aes("hello world " * 16, b"password", b"salt" * 8)
+    return lambda: crypt.decrypt_aes(data, b"password", b"salt" * 8)
+
+
+@benchmark("argon2.hash")
+def _() -> t.Callable[[], t.Any]:
+    from a import models
+
+    return lambda: models.hash_data("correct horse battery staple")
+
+
+@benchmark("argon2.verify")
+def _() -> t.Callable[[], t.Any]:
+    from a import models
+
+    h: str = models.hash_data("correct horse battery staple")
+    return lambda: models.hash_verify("correct horse battery staple", h)
+
+
+@benchmark("util.validate_username")
+def _() -> t.Callable[[], t.Any]:
+    from a import util
+
+    return lambda: util.validate_username("some.user+name-123")
+
+
+@benchmark("blog.gen_sitemap")
+def _() -> t.Callable[[], t.Any]:
+    import flask
+
+    from a.app import blog
+
+    ctx: t.Any = flask.current_app.test_request_context("/blog/@bench/sitemap.xml")
+
+    def run() -> bytes:
+        with ctx:
+            return blog.gen_sitemap("bench")
+
+    return run
+
+
+@benchmark("blog.gen_rss")
+def _() -> t.Callable[[], t.Any]:
+    import flask
+
+    from a.app import blog
+
+    ctx: t.Any = flask.current_app.test_request_context("/blog/@bench/rss.xml")
+
+    def run() -> bytes:
+        with ctx:
+            return blog.gen_rss("bench")
+
+    return run
+
+
+def populate() -> None:
+    """a user with a blog of `POSTS` posts, needs an app context"""
+
+    from a import const, models
+
+    if models.User.query.filter_by(username="bench").first() is not None:
+        return
+
+    models.db.session.add(models.User("bench", "benchmark password", "123456"))
+    models.db.session.add(
+        models.Blog(
+            "bench",
+            "bench",
+            "bench",
+            "a blog for benchmarks",
+            "bench",
+            "bench",
+            "#000000",
+            "#ffffff",
+            "en_US",
+        )
+    )
+    models.db.session.commit()
+
+    for idx in range(POSTS):
+        models.db.session.add(
+            models.BlogPost(
+                f"benchmark post number {idx}",
+                "bench",
+                const.EXAMPLE_MARKDOWN,
+                "a post for benchmarks",
+                "bench",
+            )
+        )
+
+    models.db.session.commit()
+
+
+def measure(
+    fn: t.Callable[[], t.Any], repeat: int, budget: float
+) -> t.Dict[str, t.Any]:
+    """time `fn`, each of the `repeat` runs loops for about `budget` seconds"""
+
+    timer: timeit.Timer = timeit.Timer(fn)
+
+    # `autorange` finds a loop count taking at least 0.2 seconds
+
+    number, seconds = timer.autorange()
+    number = max(1, int(number * budget / max(seconds, 1e-9)))
+
+    runs: t.List[float] = [run / number for run in timer.repeat(repeat, number)]
+
+    return {
+        "loops": number,
+        "runs": runs,
+        "min": min(runs),
+        "median": statistics.median(runs),
+        "stdev": statistics.stdev(runs) if len(runs) > 1 else 0.0,
+    }
+
+
+def fmt(seconds: float) -> str:
+    """human readable duration"""
+
+    for unit, scale in (("s", 1), ("ms", 1e-3), ("us", 1e-6)):
+        if seconds >= scale:
+            return f"{seconds / scale:.3f} {unit}"
+
+    return f"{seconds / 1e-9:.1f} ns"
+
+
+def compare(old: t.Dict[str, t.Any], new: t.Dict[str, t.Any]) -> None:
+    """print the change of the median of every benchmark in both runs"""
+
+    for name, result in new["benchmarks"].items():
+        if name not in old["benchmarks"]:
+            continue
+
+        before: float = old["benchmarks"][name]["median"]
+        after: float = result["median"]
+
+        print(
+            f"{name:32} {fmt(before):>12} -> {fmt(after):>12} "
+            f"{(after - before) / before * 100:+8.1f} %",
+            file=sys.stderr,
+        )
+
+
+def main() -> int:
+    """entry / main function"""
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("-f", "--filter", help="only run benchmarks matching a regex")
+    parser.add_argument("-r", "--repeat", type=int, default=7, help="runs per benchmark")
+    parser.add_argument(
+        "-t", "--time", type=float, default=0.2, help="seconds per run ( about )"
+    )
+    parser.add_argument("-o", "--output", help="write the results to a file")
+    parser.add_argument("-c", "--compare", help="compare with an older result file")
+    parser.add_argument("-l", "--list", action="store_true", help="list the benchmarks")
+    args: argparse.Namespace = parser.parse_args()
+
+    names: t.List[str] = [
+        name
+        for name in benchmarks
+        if args.filter is None or re.search(args.filter, name)
+    ]
+
+    if args.list:
+        print("\n".join(names))
+        return 0
+
+    results: t.Dict[str, t.Any] = {
+        "time": time.time(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "cpus": os.cpu_count(),
+        "benchmarks": {},
+    }
+
+    with tempfile.TemporaryDirectory() as workdir:
+        app = local.create_app(workdir)
+
+        with app.app_context():
+            from a import models
+
+            models.db.create_all()
+            populate()
+
+            results["argon2"] = {
+                "time_cost": app.config["ARGON2_TIME_COST"],
+                "parallelism": app.config["ARGON2_PARALLELISM"],
+            }
+
+            for name in names:
+                result: t.Dict[str, t.Any] = measure(
+                    benchmarks[name](), args.repeat, args.time
+                )
+                results["benchmarks"][name] = result
+
+                print(
+                    f"{name:32} {fmt(result['median']):>12} "
+                    f"+- {fmt(result['stdev']):>12} ( {result['loops']} loops )",
+                    file=sys.stderr,
+                )
+
+    if args.compare:
+        with open(args.compare, "r") as fp:
+            compare(json.load(fp), results)
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent=4)
+    else:
+        print(json.dumps(results, indent=4))
+
+    return 0
+
+
+if __name__ == "__main__":
+    assert main.__annotations__.get("return") is int, "main() should return an integer"
+    raise SystemExit(main())
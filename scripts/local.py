@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""local app for offline scripts : sqlite, no memcached, no rate limiting"""
+
+import os
+import sqlite3
+import sys
+import typing as t
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src"))
+
+import flask  # noqa: E402
+from sqlalchemy import event  # noqa: E402
+from sqlalchemy.engine import Engine  # noqa: E402
+
+
+@event.listens_for(Engine, "connect")
+def _(conn: t.Any, _: t.Any) -> None:
+    """mariadb collations used by the models"""
+
+    if isinstance(conn, sqlite3.Connection):
+        conn.create_collation("utf8mb4_unicode_ci", lambda a, b: (a > b) - (a < b))  # type: ignore
+
+
+def create_app(
+    workdir: str,
+    config: t.Optional[t.Dict[str, t.Any]] = None,
+) -> flask.Flask:
+    """create an app with its database and key files in `workdir`"""
+
+    from a import create_app as create
+
+    workdir = os.path.abspath(workdir)
+    os.makedirs(workdir, exist_ok=True)
+    os.chdir(workdir)
+
+    return create(
+        "",
+        "",
+        {
+            "SQLALCHEMY_DATABASE_URI": f"sqlite:///{os.path.join(workdir, 'db.sqlite')}",
+            "SQLALCHEMY_ENGINE_OPTIONS": {},
+            "RATELIMIT_ENABLED": False,
+            "CACHE_SERVERS": [],
+            "CACHE_SNAPSHOT_DIR": "",
+            "BUS_DIR": "",
+            "ACCESS_LOG_FILE": "",
+            "PROFILE_DIR": "",
+            "WATCHDOG_SOFT_LIMIT": 0,
+            **(config or {}),
+        },
+    )
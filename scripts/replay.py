@@ -0,0 +1,437 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""traffic replay and load test
+
+`serve` fills a local database with `scale` data and runs it under gunicorn, with
+memcached or the in-process l1 cache only, and writes the users, posts and
+counters it made to `targets.json`
+
+`run` sends a synthetic mix of counter embeds, blog reads, rss polls, logins and
+previews built from `targets.json`, or replays the get requests of an access
+log, from `--concurrency` clients and reports throughput and the latency
+percentiles of every route
+
+    python3 scripts/replay.py serve --users 256 --workers 4 --cache memcached
+    python3 scripts/replay.py run --targets replay/targets.json -c 16 -d 30
+    python3 scripts/replay.py run --log src/instance/access.log -c 16 -n 10000"""
+
+import argparse
+import http.cookiejar
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+import typing as t
+import urllib.error
+import urllib.parse
+import urllib.request
+
+import local
+import scale
+
+SCRIPTS: t.Final[str] = os.path.dirname(os.path.abspath(__file__))
+MIX: t.Final[str] = "counter=40,blog=15,post=20,rss=15,login=5,preview=5"
+
+Request = t.Tuple[str, str, t.Optional[t.Dict[str, str]]]  # route, path, form
+
+
+def app() -> t.Any:
+    """gunicorn app factory, configured by `serve` through the environment"""
+
+    cache: str = os.environ["REPLAY_CACHE"]
+    workdir: str = os.environ["REPLAY_DIR"]
+
+    config: t.Dict[str, t.Any] = {
+        # the load test clients talk plain http
+        "SESSION_COOKIE_SECURE": False,
+        "REMEMBER_COOKIE_SECURE": False,
+        # the replayed logins cannot solve captchas
+        "CAPTCHA_ENABLED": False,
+    }
+
+    if cache != "memory":
+        config["CACHE_SERVERS"] = [cache]
+        config["BUS_DIR"] = os.path.join(workdir, "bus")
+
+    if os.environ.get("REPLAY_DATABASE"):
+        config["SQLALCHEMY_DATABASE_URI"] = os.environ["REPLAY_DATABASE"]
+
+    return local.create_app(workdir, config)
+
+
+def serve(args: argparse.Namespace) -> int:
+    """generate data and exec gunicorn"""
+
+    workdir: str = os.path.abspath(args.dir)
+
+    os.environ["REPLAY_DIR"] = workdir
+    os.environ["REPLAY_CACHE"] = args.cache
+    os.environ["REPLAY_DATABASE"] = args.database or ""
+
+    flask_app: t.Any = app()
+
+    with flask_app.app_context():
+        from a import models
+
+        models.db.create_all()
+        print(scale.generate(args.users, random.Random(args.seed)), file=sys.stderr)
+
+        rng: random.Random = random.Random(args.seed)
+
+        # the columns are annotated as their python types, not as columns
+
+        users: t.Any = models.User
+        blogs: t.Any = models.Blog
+        posts: t.Any = models.BlogPost
+        counters: t.Any = models.Counter
+
+        targets: t.Dict[str, t.Any] = {
+            "password": scale.PASSWORD,
+            "pin": scale.PIN,
+            "users": [username for (username,) in models.db.session.query(users.username)],
+            "blogs": {
+                username: [
+                    slug
+                    for (slug,) in models.db.session.query(posts.slug)
+                    .filter_by(username=username)
+                    .limit(args.sample)
+                ]
+                for (username,) in models.db.session.query(blogs.username)
+            },
+            "counters": rng.sample(
+                [
+                    [username, id]
+                    for username, id in models.db.session.query(
+                        counters.username, counters.id
+                    )
+                ],
+                k=min(args.sample, counters.query.count()),
+            ),
+        }
+
+    with open(os.path.join(workdir, "targets.json"), "w") as fp:
+        json.dump(targets, fp)
+
+    argv: t.List[str] = [
+        sys.executable,
+        "-m",
+        "gunicorn",
+        "-c",
+        os.path.join(SCRIPTS, "..", "src", "gunicorn.conf.py"),
+        "--pythonpath",
+        SCRIPTS,
+        "-b",
+        args.bind,
+        "-w",
+        str(args.workers),
+        "-k",
+        args.worker_class,
+        "--threads",
+        str(args.threads),
+        "replay:app()",
+    ]
+
+    print(" ".join(argv), file=sys.stderr)
+    os.execv(sys.executable, argv)
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    """report redirects instead of following them"""
+
+    def redirect_request(self, *_: t.Any, **__: t.Any) -> None:
+        return None
+
+
+class Client:
+    """a load test client with its own session"""
+
+    def __init__(self, url: str, targets: t.Dict[str, t.Any], rng: random.Random) -> None:
+        self.url: str = url
+        self.targets: t.Dict[str, t.Any] = targets
+        self.rng: random.Random = rng
+        self.user: t.Optional[str] = None
+        self.opener: urllib.request.OpenerDirector = self.session()
+
+    @staticmethod
+    def session() -> urllib.request.OpenerDirector:
+        """a new cookie jar"""
+
+        return urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()),
+            NoRedirect(),
+        )
+
+    def request(self, path: str, form: t.Optional[t.Dict[str, str]] = None) -> int:
+        """send a request and read the whole response, 0 on connection errors"""
+
+        request: urllib.request.Request = urllib.request.Request(
+            self.url + path,
+            None if form is None else urllib.parse.urlencode(form).encode("ascii"),
+        )
+
+        try:
+            with self.opener.open(request, timeout=60) as response:
+                response.read()
+                return response.status
+        except urllib.error.HTTPError as e:
+            e.read()
+            return e.code
+        except OSError:
+            return 0
+
+    def login(self, user: str) -> Request:
+        """sign in as `user` in a new session"""
+
+        self.opener = self.session()
+        self.user = user
+
+        return (
+            "POST /auth/signin",
+            "/auth/signin",
+            {
+                "username": user,
+                "password": self.targets["password"],
+                "pin": self.targets["pin"],
+            },
+        )
+
+    def actions(self, action: str) -> t.List[Request]:
+        """requests making up a synthetic action"""
+
+        blogs: t.Dict[str, t.List[str]] = self.targets["blogs"]
+        blog: str = self.rng.choice(tuple(blogs))
+
+        if action == "counter":
+            user, id = self.rng.choice(self.targets["counters"])
+            return [("/counter/@<user>/<id>.svg", f"/counter/@{user}/{id}.svg", None)]
+        elif action == "blog":
+            return [("/blog/@<user>", f"/blog/@{blog}", None)]
+        elif action == "post":
+            slug: str = self.rng.choice(blogs[blog])
+            return [("/blog/@<user>/<slug>", f"/blog/@{blog}/{slug}", None)]
+        elif action == "rss":
+            return [("/blog/@<user>/rss.xml", f"/blog/@{blog}/rss.xml", None)]
+        elif action == "login":
+            return [self.login(self.rng.choice(self.targets["users"]))]
+        elif action == "preview":
+            requests: t.List[Request] = []
+
+            if self.user not in blogs:
+                requests.append(self.login(blog))
+
+            return requests + [
+                (
+                    "POST /blog/@<user>/~new/preview",
+                    f"/blog/@{self.user}/~new/preview",
+                    {"title": "a preview", "content": "# hello\n\n*world*\n" * 16},
+                ),
+                ("/blog/~preview", "/blog/~preview?ctx=post", None),
+            ]
+
+        raise ValueError(f"unknown action {action!r}")
+
+
+def percentile(values: t.List[float], p: float) -> float:
+    """nearest rank percentile of sorted `values`"""
+    return values[min(len(values) - 1, int(len(values) * p / 100))]
+
+
+def run(args: argparse.Namespace) -> int:
+    """send the traffic and report"""
+
+    log: t.List[Request] = []
+    targets: t.Dict[str, t.Any] = {}
+    mix: t.List[t.Tuple[str, float]] = []
+
+    if args.log:
+        skipped: int = 0
+
+        with open(args.log, "r") as fp:
+            for line in fp:
+                record: t.Dict[str, t.Any] = json.loads(line)
+
+                if "path" not in record:
+                    continue
+
+                # request bodies are not logged
+                if record["method"] != "GET":
+                    skipped += 1
+                    continue
+
+                log.append((record["route"] or record["path"], record["path"], None))
+
+        print(f"replaying {len(log)} requests, {skipped} non-get skipped", file=sys.stderr)
+
+        if not log:
+            return 1
+    else:
+        with open(args.targets, "r") as fp:
+            targets = json.load(fp)
+
+        for item in args.mix.split(","):
+            action, weight = item.split("=")
+            mix.append((action.strip(), float(weight)))
+
+    url: str = args.url.rstrip("/")
+    counter: t.Iterator[int] = itertools.count()
+    results: t.List[t.Tuple[str, int, float]] = []
+    deadline: float = time.monotonic() + args.duration if args.duration else float("inf")
+
+    def worker(seed: int) -> None:
+        client: Client = Client(url, targets, random.Random(seed))
+
+        while time.monotonic() < deadline:
+            if log:
+                idx: int = next(counter)
+
+                if idx >= args.requests:
+                    return
+
+                requests: t.List[Request] = [log[idx % len(log)]]
+            else:
+                if next(counter) >= args.requests:
+                    return
+
+                requests = client.actions(
+                    client.rng.choices(
+                        [action for action, _ in mix], [weight for _, weight in mix]
+                    )[0]
+                )
+
+            for route, path, form in requests:
+                start: float = time.perf_counter()
+                status: int = client.request(path, form)
+                results.append((route, status, time.perf_counter() - start))
+
+    threads: t.List[threading.Thread] = [
+        threading.Thread(target=worker, args=(args.seed + idx,), daemon=True)
+        for idx in range(args.concurrency)
+    ]
+
+    start: float = time.perf_counter()
+
+    for thread in threads:
+        thread.start()
+
+    for thread in threads:
+        thread.join()
+
+    elapsed: float = time.perf_counter() - start
+
+    routes: t.Dict[str, t.List[t.Tuple[int, float]]] = {}
+
+    for route, status, seconds in results:
+        routes.setdefault(route, []).append((status, seconds))
+
+    report: t.Dict[str, t.Any] = {
+        "time": time.time(),
+        "url": url,
+        "concurrency": args.concurrency,
+        "elapsed": elapsed,
+        "requests": len(results),
+        "throughput": len(results) / elapsed,
+        "routes": {},
+    }
+
+    print(
+        f"{len(results)} requests in {elapsed:.2f} s, "
+        f"{report['throughput']:.1f} requests / s",
+        file=sys.stderr,
+    )
+    print(
+        f"{'route':40} {'count':>7} {'rps':>8} {'errors':>6} "
+        f"{'p50':>9} {'p90':>9} {'p99':>9} statuses",
+        file=sys.stderr,
+    )
+
+    for route, samples in sorted(routes.items(), key=lambda item: -len(item[1])):
+        times: t.List[float] = sorted(seconds for _, seconds in samples)
+        statuses: t.Dict[int, int] = {}
+
+        for status, _ in samples:
+            statuses[status] = statuses.get(status, 0) + 1
+
+        result: t.Dict[str, t.Any] = {
+            "count": len(samples),
+            "throughput": len(samples) / elapsed,
+            "errors": sum(
+                count for status, count in statuses.items() if not status or status >= 500
+            ),
+            "statuses": statuses,
+            "p50": percentile(times, 50),
+            "p90": percentile(times, 90),
+            "p99": percentile(times, 99),
+            "max": times[-1],
+        }
+        report["routes"][route] = result
+
+        print(
+            f"{route:40} {result['count']:7} {result['throughput']:8.1f} "
+            f"{result['errors']:6} {result['p50'] * 1000:7.1f}ms "
+            f"{result['p90'] * 1000:7.1f}ms {result['p99'] * 1000:7.1f}ms "
+            f"{statuses}",
+            file=sys.stderr,
+        )
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(report, fp, indent=4)
+    else:
+        print(json.dumps(report, indent=4))
+
+    return 0
+
+
+def main() -> int:
+    """entry / main function"""
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter
+    )
+    commands: t.Any = parser.add_subparsers(dest="command", required=True)
+
+    p: argparse.ArgumentParser = commands.add_parser("serve", help="run a local instance")
+    p.add_argument("--dir", default="replay", help="data directory")
+    p.add_argument("--users", type=int, default=256, help="`scale` step size")
+    p.add_argument("--sample", type=int, default=1024, help="targets per kind")
+    p.add_argument("--database", help="database uri, sqlite by default")
+    p.add_argument(
+        "--cache",
+        default="memory",
+        help="memcached address, or `memory` for the l1 cache only",
+    )
+    p.add_argument("-b", "--bind", default="127.0.0.1:8000")
+    p.add_argument("-w", "--workers", type=int, default=os.cpu_count() or 4)
+    p.add_argument("-k", "--worker-class", default="sync")
+    p.add_argument("--threads", type=int, default=1)
+    p.add_argument("--seed", type=int, default=0)
+
+    p = commands.add_parser("run", help="send traffic")
+    p.add_argument("--url", default="http://127.0.0.1:8000")
+    source: t.Any = p.add_mutually_exclusive_group(required=True)
+    source.add_argument("--targets", help="targets.json written by `serve`")
+    source.add_argument("--log", help="access log to replay")
+    p.add_argument("--mix", default=MIX, help="synthetic action weights")
+    p.add_argument("-c", "--concurrency", type=int, default=8)
+    p.add_argument("-n", "--requests", type=int, help="iteration limit")
+    p.add_argument("-d", "--duration", type=float, default=0, help="seconds limit")
+    p.add_argument("--seed", type=int, default=0)
+    p.add_argument("-o", "--output", help="write the report to a file")
+
+    args: argparse.Namespace = parser.parse_args()
+
+    if args.command == "serve":
+        return serve(args)
+
+    if args.requests is None:
+        args.requests = 2**62 if args.duration else 1000
+
+    return run(args)
+
+
+if __name__ == "__main__":
+    assert main.__annotations__.get("return") is int, "main() should return an integer"
+    raise SystemExit(main())
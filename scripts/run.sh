@@ -2,16 +2,36 @@
 
 set -u
 
+stop() {
+    pkill "$1" || return 0
+
+    for _ in $(seq 30); do
+        pgrep "$1" >/dev/null || return 0
+        sleep 1
+    done
+
+    pkill -9 "$1" || true
+}
+
 main() {
     [ "$MARIA_USER" ] && [ "$MARIA_PASS" ]
 
-    kill -9 $(pgrep python3) || true
+    # workers snapshot their cache on a graceful exit
+    stop python3
     kill -9 $(pgrep memcached) || true
 
     cd src
     python3 -m pip install gunicorn
     memcached -m 1024 &
     sleep 5
+    python3 -m a.schema migrate || true
+    python3 -m a.warm || true
+
+    # metrics of the previous workers are not carried over
+    export PROMETHEUS_MULTIPROC_DIR="$PWD/instance/metrics"
+    rm -rf "$PROMETHEUS_MULTIPROC_DIR"
+    mkdir -p "$PROMETHEUS_MULTIPROC_DIR"
+
     python3 -m gunicorn -b 127.0.0.1:8000 -w "$(nproc --all)" main:app &
     disown
 }
@@ -0,0 +1,378 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""synthetic data and scaling test
+
+fills a local database ( sqlite by default, or `--database` for a local mariadb )
+step by step, at step `n` there are `n` users, every `BLOG_EVERY`th user has a
+blog with up to `n` posts and every user has up to `n` counters, after every step
+the key routes are requested through the test client, once untimed to compile
+templates and fill the lru caches, then timed with `cache.store.l1` cleared before
+every request, there is no l2 locally so that drops the cached pages and rows but
+the lru caches and the name filters stay warm
+
+the latency of a route is fit against `n` on a log-log scale, routes whose
+slope is over `--slope` grow superlinearly with the data and are flagged
+
+    python3 scripts/scale.py --steps 16,64,256 -o scale.json"""
+
+import argparse
+import json
+import math
+import random
+import secrets
+import statistics
+import sys
+import tempfile
+import time
+import typing as t
+from datetime import datetime, timedelta
+
+from sqlalchemy import insert
+
+import local
+
+BLOG_EVERY: t.Final[int] = 4
+PROBE: t.Final[str] = "scale000000"
+PASSWORD: t.Final[str] = "scale password"
+PIN: t.Final[str] = "123456"
+
+# routes to measure, `{user}` is the probe user, which has the largest blog, and
+# `{slug}` / `{counter}` are one of its posts and counters
+
+ROUTES: t.Final[t.Tuple[str, ...]] = (
+    "/",
+    "/@{user}",
+    "/sitemap.xml",
+    "/robots.txt",
+    "/blog/",
+    "/blog/@{user}",
+    "/blog/@{user}/{slug}",
+    "/blog/@{user}/rss.xml",
+    "/blog/@{user}/sitemap.xml",
+    "/blog/@{user}/robots.txt",
+    "/counter/",
+    "/counter/@{user}/{counter}.svg",
+    "/admin/",
+)
+
+
+def content(rng: random.Random) -> str:
+    """post content of a random realistic size"""
+
+    from a import const
+
+    size: int = int(rng.lognormvariate(math.log(2**12), 0.8))
+    text: str = const.EXAMPLE_MARKDOWN * (size // len(const.EXAMPLE_MARKDOWN) + 1)
+
+    return text[: min(size, const.BLOG_POST_CONTENT_LEN)]
+
+
+def generate(n: int, rng: random.Random) -> t.Dict[str, int]:
+    """grow the database to step `n`, needs an app context"""
+
+    from a import const, models, names
+
+    db: t.Any = models.db
+
+    now: datetime = datetime.utcnow()  # type: ignore
+    users: int = db.session.query(models.User).count()
+
+    # every user gets the same hashes, hashing is the slow part of making a user
+
+    if users < n:
+        password_hash: str = models.hash_data(PASSWORD)
+        pin_hash: str = models.hash_data(PIN)
+
+        db.session.execute(
+            insert(models.User),
+            [
+                {
+                    "username": f"scale{idx:06}",
+                    "bio": "a user made for scaling tests",
+                    "password_hash": password_hash,
+                    "pin_hash": pin_hash,
+                    "role": const.Role.admin if idx == 0 else const.Role.user,
+                    "limited": False,
+                    "joined": now - timedelta(days=n - idx),
+                }
+                for idx in range(users, n)
+            ],
+        )
+
+        blogs: t.List[t.Dict[str, t.Any]] = [
+            {
+                "username": f"scale{idx:06}",
+                "title": f"blog of scale{idx:06}",
+                "header": f"scale{idx:06}",
+                "description": "a blog made for scaling tests",
+                "keywords": "scale,test",
+                "default_keywords": "scale,test",
+                "primary": "#000000",
+                "secondary": "#ffffff",
+                "locale": "en_US",
+                "comment_url": None,
+                "visitor_url": None,
+                "style": None,
+                "code_theme": const.CodeTheme.none,
+            }
+            for idx in range(users, n)
+            if idx % BLOG_EVERY == 0
+        ]
+
+        if blogs:
+            db.session.execute(insert(models.Blog), blogs)
+
+    for (username,) in db.session.query(models.Blog.username):
+        have: int = models.BlogPost.query.filter_by(username=username).count()
+        want: int = min(n, const.BLOG_POST_MAX)
+
+        if have < want:
+            db.session.execute(
+                insert(models.BlogPost),
+                [
+                    {
+                        "id": models.gen_id(),
+                        "slug": f"post-{idx}-{secrets.token_hex(4)}",
+                        "title": f"post number {idx}",
+                        "keywords": "scale,test",
+                        "content": content(rng),
+                        "description": f"post number {idx} of {username}",
+                        "posted": now - timedelta(hours=want - idx),
+                        "edited": now - timedelta(hours=want - idx),
+                        "username": username,
+                    }
+                    for idx in range(have, want)
+                ],
+            )
+
+    want = min(n, const.COUNTERS_LIMIT)
+
+    for idx in range(n):
+        username = f"scale{idx:06}"
+        have = models.Counter.query.filter_by(username=username).count()
+
+        if have < want:
+            db.session.execute(
+                insert(models.Counter),
+                [
+                    {
+                        "id": models.gen_id(),
+                        "name": f"counter {cidx}",
+                        "count": rng.randrange(2**20),
+                        "username": username,
+                        "origin": ".*",
+                        "active": now,
+                    }
+                    for cidx in range(have, want)
+                ],
+            )
+
+    db.session.commit()
+
+    names.users.bump()
+    names.blogs.bump()
+
+    return {
+        "users": db.session.query(models.User).count(),
+        "blogs": db.session.query(models.Blog).count(),
+        "posts": db.session.query(models.BlogPost).count(),
+        "counters": db.session.query(models.Counter).count(),
+    }
+
+
+def measure(app: t.Any, repeat: int) -> t.Dict[str, t.Dict[str, float]]:
+    """median latency and query count of every route after a warm-up request,
+    `cache.store.l1` cleared"""
+
+    import flask_login  # type: ignore
+
+    from a import cache, models, query
+
+    # the columns are annotated as their python types, not as columns
+
+    posts: t.Any = models.BlogPost
+    counters: t.Any = models.Counter
+
+    with app.app_context():
+        slug: str = (
+            posts.query.filter_by(username=PROBE)
+            .order_by(posts.posted.desc())
+            .first()
+            .slug
+        )
+        counter: str = counters.query.filter_by(username=PROBE).first().id
+
+    queries: t.List[int] = [0]
+
+    @query.listen
+    def count(_: str, __: float) -> None:
+        queries[0] += 1
+
+    client: t.Any = app.test_client()
+
+    # sign in as the probe user, which is an admin, the session is bound to the
+    # address and user agent of the client
+
+    with app.test_request_context(environ_base=client.environ_base):
+        identifier: str = flask_login.utils._create_identifier()  # type: ignore
+
+    with client.session_transaction() as session:
+        session["_user_id"] = PROBE
+        session["_fresh"] = True
+        session["_id"] = identifier
+
+    results: t.Dict[str, t.Dict[str, float]] = {}
+
+    for route in ROUTES:
+        path: str = route.format(user=PROBE, slug=slug, counter=counter)
+        times: t.List[float] = []
+        status: int = 0
+
+        with client.get(path) as response:
+            response.get_data()
+
+        for _ in range(repeat):
+            cache.store.l1.clear()
+            queries[0] = 0
+
+            start: float = time.perf_counter()
+
+            with client.get(path) as response:
+                response.get_data()
+                status = response.status_code
+
+            times.append(time.perf_counter() - start)
+
+        results[route] = {
+            "status": status,
+            "median": statistics.median(times),
+            "min": min(times),
+            "queries": queries[0],
+        }
+
+    query.listeners.remove(count)
+
+    return results
+
+
+def slope(xs: t.List[float], ys: t.List[float]) -> float:
+    """least squares slope of `ys` over `xs` on a log-log scale"""
+
+    lx: t.List[float] = [math.log(x) for x in xs]
+    ly: t.List[float] = [math.log(max(y, 1e-9)) for y in ys]
+
+    mx: float = statistics.fmean(lx)
+    my: float = statistics.fmean(ly)
+
+    den: float = sum((x - mx) ** 2 for x in lx)
+
+    if not den:
+        return 0.0
+
+    return sum((x - mx) * (y - my) for x, y in zip(lx, ly)) / den
+
+
+def main() -> int:
+    """entry / main function"""
+
+    parser: argparse.ArgumentParser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "-s", "--steps", default="16,64,256", help="comma separated step sizes"
+    )
+    parser.add_argument("-r", "--repeat", type=int, default=5, help="requests per route")
+    parser.add_argument(
+        "--slope",
+        type=float,
+        default=1.1,
+        help="flag routes growing faster than n ** slope",
+    )
+    parser.add_argument("-d", "--database", help="database uri, sqlite by default")
+    parser.add_argument("--seed", type=int, default=0, help="content seed")
+    parser.add_argument("-o", "--output", help="write the results to a file")
+    args: argparse.Namespace = parser.parse_args()
+
+    steps: t.List[int] = sorted({int(step) for step in args.steps.split(",")})
+
+    if steps[0] < 1:
+        print("steps must be positive", file=sys.stderr)
+        return 1
+
+    rng: random.Random = random.Random(args.seed)
+
+    results: t.Dict[str, t.Any] = {"time": time.time(), "steps": []}
+
+    with tempfile.TemporaryDirectory() as workdir:
+        # the test client does not send secure cookies over http
+
+        config: t.Dict[str, t.Any] = {"SESSION_COOKIE_SECURE": False}
+
+        if args.database:
+            config["SQLALCHEMY_DATABASE_URI"] = args.database
+
+        app: t.Any = local.create_app(workdir, config)
+
+        with app.app_context():
+            from a import models
+
+            models.db.create_all()
+
+        for n in steps:
+            with app.app_context():
+                start: float = time.perf_counter()
+                sizes: t.Dict[str, int] = generate(n, rng)
+                took: float = time.perf_counter() - start
+
+            print(
+                f"step {n} : {sizes} ( generated in {took:.1f} s )", file=sys.stderr
+            )
+
+            routes: t.Dict[str, t.Dict[str, float]] = measure(app, args.repeat)
+            results["steps"].append({"n": n, "sizes": sizes, "routes": routes})
+
+            for route, result in routes.items():
+                print(
+                    f"    {route:36} {result['status']:3} "
+                    f"{result['median'] * 1000:10.2f} ms {result['queries']:6} queries",
+                    file=sys.stderr,
+                )
+
+    results["growth"] = {}
+
+    if len(steps) > 1:
+        print("growth ( latency ~ n ** slope ) :", file=sys.stderr)
+
+        for route in ROUTES:
+            latency: float = slope(
+                [step["n"] for step in results["steps"]],
+                [step["routes"][route]["median"] for step in results["steps"]],
+            )
+            queries: float = slope(
+                [step["n"] for step in results["steps"]],
+                [max(step["routes"][route]["queries"], 1) for step in results["steps"]],
+            )
+
+            superlinear: bool = latency > args.slope
+            results["growth"][route] = {
+                "latency": latency,
+                "queries": queries,
+                "superlinear": superlinear,
+            }
+
+            print(
+                f"    {route:36} {latency:6.2f} {queries:6.2f} queries"
+                f"{'  SUPERLINEAR' if superlinear else ''}",
+                file=sys.stderr,
+            )
+
+    if args.output:
+        with open(args.output, "w") as fp:
+            json.dump(results, fp, indent=4)
+    else:
+        print(json.dumps(results, indent=4))
+
+    return 0
+
+
+if __name__ == "__main__":
+    assert main.__annotations__.get("return") is int, "main() should return an integer"
+    raise SystemExit(main())
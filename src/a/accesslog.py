@@ -0,0 +1,246 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""access log
+
+requests are logged as json lines by a writer thread, request threads only put
+records on a bounded queue and drop them if it is full, all workers append to the
+same file with one `O_APPEND` write per line, so lines of different workers never
+interleave, and rotate it by size under a lock file"""
+
+import atexit
+import fcntl
+import json
+import os
+import queue
+import threading
+import time
+import typing as t
+from time import perf_counter
+
+import flask
+
+from . import query
+
+BATCH: t.Final[int] = 256
+
+
+class AccessLog:
+    """asynchronous json lines access log"""
+
+    def __init__(self) -> None:
+        self.path: str = ""
+        self.max_bytes: int = 0
+        self.backups: int = 0
+        self.queue: "queue.Queue[t.Optional[str]]" = queue.Queue()
+        self.dropped: int = 0
+        self.fd: int = -1
+        self.thread: t.Optional[threading.Thread] = None
+        self.pid: int = 0
+        self.lock: threading.Lock = threading.Lock()
+
+    def init_app(self, app: flask.Flask) -> None:
+        """log the requests of `app`"""
+
+        app.config.setdefault("ACCESS_LOG_FILE", "")
+        app.config.setdefault("ACCESS_LOG_MAX_BYTES", 2**26)
+        app.config.setdefault("ACCESS_LOG_BACKUPS", 5)
+        app.config.setdefault("ACCESS_LOG_QUEUE", 2**14)
+
+        if not self.setup(
+            app.config["ACCESS_LOG_FILE"],
+            app.config["ACCESS_LOG_MAX_BYTES"],
+            app.config["ACCESS_LOG_BACKUPS"],
+            app.config["ACCESS_LOG_QUEUE"],
+        ):
+            return
+
+        @query.listen
+        def _(_: str, seconds: float) -> None:
+            if flask.has_request_context():  # type: ignore
+                flask.g.db_count = flask.g.get("db_count", 0) + 1
+                flask.g.db_time = flask.g.get("db_time", 0) + seconds
+
+        @app.before_request
+        def _() -> None:
+            """start timing the request"""
+            flask.g.access_start = perf_counter()
+
+        @app.after_request
+        def _(response: flask.Response) -> flask.Response:
+            """remember the response"""
+
+            flask.g.access_status = response.status_code
+            flask.g.access_bytes = (
+                "-" if response.is_streamed else response.content_length
+            )
+
+            return response
+
+        @app.teardown_request
+        def _(_: t.Optional[BaseException]) -> None:
+            """log the request"""
+
+            if (start := flask.g.get("access_start")) is None:
+                return
+
+            rule: t.Any = flask.request.url_rule
+
+            # the session is checked rather than `current_user`, which could load
+            # the user from the database
+
+            self.log(
+                {
+                    "time": time.time(),
+                    "route": rule.rule if rule is not None else None,
+                    "endpoint": flask.request.endpoint,
+                    "method": flask.request.method,
+                    "path": flask.request.path,
+                    "status": flask.g.get("access_status", 500),
+                    "bytes": flask.g.get("access_bytes"),
+                    "total": round(perf_counter() - start, 6),
+                    "db": round(flask.g.get("db_time", 0), 6),
+                    "queries": flask.g.get("db_count", 0),
+                    "cache": flask.g.get("cache"),
+                    "user": "_user_id" in flask.session,
+                }
+            )
+
+    def setup(
+        self,
+        path: str,
+        max_bytes: int = 2**26,
+        backups: int = 5,
+        size: int = 2**14,
+    ) -> bool:
+        """write to `path`, rotated at `max_bytes` with `backups` old files and at
+        most `size` queued records, returns false if `path` is empty"""
+
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backups = backups
+        self.queue = queue.Queue(size)
+
+        if not self.path:
+            return False
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        atexit.register(self.close)
+
+        return True
+
+    def log(self, record: t.Dict[str, t.Any]) -> None:
+        """queue a record, never blocks"""
+
+        self.start()
+
+        try:
+            self.queue.put_nowait(json.dumps(record, separators=(",", ":")))
+        except queue.Full:
+            self.dropped += 1
+
+    def start(self) -> None:
+        """start the writer in this worker if it is not running"""
+
+        if self.pid == os.getpid():
+            return
+
+        with self.lock:
+            if self.pid != os.getpid():
+                self.fd = -1
+                self.thread = threading.Thread(target=self.run, daemon=True)
+                self.thread.start()
+                self.pid = os.getpid()
+
+    def open(self) -> int:
+        """get the log file descriptor, reopening it if another worker rotated it"""
+
+        if self.fd >= 0:
+            try:
+                if os.stat(self.path).st_ino == os.fstat(self.fd).st_ino:
+                    return self.fd
+            except FileNotFoundError:
+                pass
+
+            os.close(self.fd)
+
+        self.fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        return self.fd
+
+    def rotate(self) -> None:
+        """rotate the log if it is too big, only one worker rotates at a time"""
+
+        with open(f"{self.path}.lock", "w") as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+
+            try:
+                if os.stat(self.path).st_size < self.max_bytes:
+                    return  # already rotated by another worker
+            except FileNotFoundError:
+                return
+
+            for idx in range(self.backups - 1, 0, -1):
+                if os.path.exists(f"{self.path}.{idx}"):
+                    os.replace(f"{self.path}.{idx}", f"{self.path}.{idx + 1}")
+
+            if self.backups > 0:
+                os.replace(self.path, f"{self.path}.1")
+            else:
+                os.remove(self.path)
+
+    def write(self, lines: t.List[str]) -> None:
+        """write lines and rotate if needed"""
+
+        fd: int = self.open()
+
+        if self.dropped:
+            lines.append(json.dumps({"time": time.time(), "dropped": self.dropped}))
+            self.dropped = 0
+
+        for line in lines:
+            os.write(fd, f"{line}\n".encode())
+
+        if self.max_bytes and os.fstat(fd).st_size >= self.max_bytes:
+            self.rotate()
+
+    def run(self) -> None:
+        """write records in batches until `None` is queued"""
+
+        while True:
+            line: t.Optional[str] = self.queue.get()
+            lines: t.List[str] = []
+
+            while line is not None:
+                lines.append(line)
+
+                if len(lines) >= BATCH:
+                    break
+
+                try:
+                    line = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+
+            if lines:
+                try:
+                    self.write(lines)
+                except OSError:
+                    self.dropped += len(lines)
+
+            if line is None:
+                return
+
+    def close(self) -> None:
+        """flush the queue on exit"""
+
+        if self.pid != os.getpid() or self.thread is None:
+            return
+
+        try:
+            self.queue.put(None, timeout=1)
+        except queue.Full:
+            return
+
+        self.thread.join(timeout=2)
+
+
+access_log: AccessLog = AccessLog()
@@ -2,13 +2,14 @@
 # -*- coding: utf-8 -*-
 """admin pannel and apis"""
 
+import os
 import typing as t
 
 import flask
 from flask_login import current_user, login_user, logout_user  # type: ignore
 from werkzeug.wrappers import Response
 
-from .. import const, models, util
+from .. import const, memory, models, profiler, util
 from ..routing import Bp
 
 admin: Bp = Bp("admin", __name__)
@@ -79,3 +80,100 @@ def login(user: str) -> Response:
     flask.flash(f"logged you in as {user!r}", "info")
 
     return flask.redirect("/")
+
+
+@admin.get("/profiles")
+@util.require_role_route(const.Role.admin)
+def profiles() -> str:
+    """slow request profiles"""
+    return flask.render_template(
+        "profiles.j2",
+        profiles=profiler.profiler.profiles(),
+    )
+
+
+@admin.get("/profiles/<string:name>")
+@util.require_role_route(const.Role.admin)
+def profile(name: str) -> Response:
+    """collapsed stacks of a slow request"""
+
+    if (data := profiler.profiler.read(name)) is None:
+        flask.abort(404)
+
+    return util.make_api(flask.Response(data, mimetype="text/plain"), cors=False)
+
+
+def memory_worker() -> None:
+    """tracing state lives in a single worker, requests carrying `pid` are
+    refused with 409 by every other worker so the client can retry until it
+    reaches the worker it started tracing in"""
+
+    pid: t.Optional[int] = flask.request.args.get("pid", type=int)
+
+    if pid is not None and pid != os.getpid():
+        flask.abort(409)
+
+
+@admin.get("/memory")
+@util.require_role_route(const.Role.admin)
+def memory_status() -> Response:
+    """memory status of the worker handling this request"""
+    return util.make_api(flask.jsonify(memory.status()), cors=False)  # type: ignore
+
+
+@admin.post("/memory/start")
+@util.require_role_route(const.Role.admin)
+def memory_start() -> Response:
+    """start tracing allocations"""
+
+    memory_worker()
+    memory.start(max(1, min(flask.request.args.get("frames", 1, type=int), 64)))
+    return memory_status()
+
+
+@admin.post("/memory/stop")
+@util.require_role_route(const.Role.admin)
+def memory_stop() -> Response:
+    """stop tracing allocations"""
+
+    memory_worker()
+    memory.stop()
+    return memory_status()
+
+
+@admin.post("/memory/snapshot")
+@util.require_role_route(const.Role.admin)
+def memory_snapshot() -> Response:
+    """take a baseline snapshot"""
+
+    memory_worker()
+    memory.start()
+    memory.mark()
+    return memory_status()
+
+
+@admin.get("/memory/diff")
+@util.require_role_route(const.Role.admin)
+def memory_diff() -> Response:
+    """top allocation differences since the baseline snapshot"""
+
+    group: str = flask.request.args.get("group", "lineno")
+
+    if group not in ("lineno", "filename"):
+        flask.abort(400)
+
+    memory_worker()
+
+    if memory.baseline is None:
+        flask.abort(409)
+
+    return util.make_api(
+        flask.jsonify(  # type: ignore
+            pid=os.getpid(),
+            diff=memory.diff(
+                max(1, min(flask.request.args.get("limit", 25, type=int), 1000)),
+                group,
+            ),
+        ),
+        cors=False,
+    )
@@ -23,7 +23,7 @@ def index() -> Response:
 def user(username: str) -> flask.Response:
     """user api"""
 
-    user: t.Optional[models.User] = models.db.session.get(models.User, username)
+    user: t.Optional[models.User] = models.User.get_by_user(username)
 
     if user is None:
         return flask.jsonify([])  # type: ignore
@@ -43,10 +43,10 @@ def user(username: str) -> flask.Response:
 def app(user: str, id: str) -> flask.Response:
     """app api"""
 
-    app: models.App = models.App.query.filter_by(  # type: ignore
-        username=user,
-        id=id,
-    ).first_or_404()
+    app: t.Optional[models.App] = models.cached(models.App, id=id)
+
+    if app is None or app.username != user:
+        flask.abort(404)
 
     return flask.jsonify(app.json())  # type: ignore
 
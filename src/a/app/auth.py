@@ -11,7 +11,7 @@ from flask_login import login_required  # type: ignore
 from flask_login import current_user, login_user, logout_user  # type: ignore
 from werkzeug.wrappers import Response
 
-from .. import const, models, util
+from .. import cache, const, models, names, util
 from ..c import audio as gen_audio_captcha
 from ..c import c
 from ..routing import Bp
@@ -220,6 +220,9 @@ def signup() -> t.Union[t.Tuple[str, int], Response]:
             500,
         )
 
+    cache.store.delete("feed:sitemap")
+    names.users.bump()
+
     return flask.render_template("created.j2", pin=pin, username=username), 200
 
 
@@ -275,6 +278,10 @@ def delete_user() -> Response:
         flask.flash("failed to delete account", "error")
         flask.abort(500)
 
+    cache.blog_purge(current_user.username)  # type: ignore
+    names.users.bump()
+    names.blogs.bump()
+
     logout_user()
     flask.flash("account deleted", "info")
 
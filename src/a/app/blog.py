@@ -11,7 +11,7 @@ import flask
 from flask_login import current_user  # type: ignore
 from werkzeug.wrappers import Response
 
-from .. import cache, const, models, util
+from .. import cache, const, models, names, stream, util
 from ..routing import Bp
 
 blog: Bp = Bp("blog", __name__)
@@ -48,7 +48,9 @@ def blog_conf() -> Response:
         "code_theme": flask.request.form.get("code_theme"),
     }
 
-    if current_user.blog is None:  # type: ignore
+    created: bool = current_user.blog is None  # type: ignore
+
+    if created:
         try:
             current_user.blog = models.Blog(username=current_user.username, **conf)  # type: ignore
         except Exception as e:
@@ -71,6 +73,11 @@ def blog_conf() -> Response:
 
     try:
         models.db.session.commit()
+        cache.blog_purge(current_user.username)  # type: ignore
+
+        if created:
+            names.blogs.bump()
+
         flask.flash("blog updated", "info")
     except Exception as e:
         models.db.session.rollback()
@@ -81,26 +88,76 @@ def blog_conf() -> Response:
     return flask.redirect(flask.url_for("blog.index"))
 
 
+def blog_page(
+    user: str, before: t.Optional[t.Tuple[datetime, str]] = None
+) -> t.Dict[str, t.Any]:
+    """template arguments for the page of a blog after the cursor `before`"""
+
+    posts: t.List[models.PostSummary] = models.PostSummary.of(
+        user, const.BLOG_PAGE_POSTS + 1, before
+    )
+    more: bool = len(posts) > const.BLOG_PAGE_POSTS
+
+    del posts[const.BLOG_PAGE_POSTS:]
+
+    if before is None:
+        latest: t.Optional[models.PostSummary] = posts[0] if posts else None
+    else:
+        latest = next(iter(models.PostSummary.of(user, 1)), None)
+
+    return {
+        "posts": posts,
+        "latest": latest,
+        "start": models.PostSummary.count(user, before),
+        "next": posts[-1].cursor if more else None,
+    }
+
+
+def owner(user: str) -> str:
+    """the username of the blog of `user` as stored, urls may spell it in any
+    case ( the collation is case insensitive ) but cache keys may not"""
+    return models.cached_or_404(models.Blog, username=user).username
+
+
 @blog.get("/@<string:user>")
-def user_blog(user: str) -> str:
+def user_blog(user: str) -> flask.Response:
     """show user's blog"""
 
-    usr: models.User = models.User.query.filter_by(username=user).first_or_404()
-    blog: t.Optional[models.Blog] = usr.blog
-
-    if blog is None:
+    if names.blogs.absent(user):
         flask.abort(404)
 
-    return flask.render_template(
-        "blog.j2",
-        c=util.jscaptcha(),
-        blog=blog,
-        posts=models.BlogPost.query.filter_by(username=user)
-        .order_by(models.BlogPost.posted.desc())  # type: ignore
-        .all(),
-        style=((usr.blog.style or "") if usr.blog else "").split(
-            const.BLOG_POST_SECTION_DELIM, 1
-        )[0],
+    user = owner(user)
+
+    before: t.Optional[t.Tuple[datetime, str]] = None
+
+    if "before" in flask.request.args:
+        if (before := models.PostSummary.parse_cursor(flask.request.args["before"])) is None:  # type: ignore
+            flask.abort(400)
+
+    def render() -> str:
+        """render the blog, a page of post summaries is small enough to not be
+        streamed"""
+
+        blog: t.Optional[models.Blog] = models.cached(models.Blog, username=user)
+
+        if blog is None:
+            flask.abort(404)
+
+        page: t.Dict[str, t.Any] = blog_page(user, before)
+
+        return flask.render_template(
+            "blog.j2",
+            blog=blog,
+            style=(blog.style or "").split(const.BLOG_POST_SECTION_DELIM, 1)[0],
+            **page,
+        )
+
+    return util.make_public(
+        stream.page(
+            f"page:blog:{user}:{cache.blog_version(user)}:"
+            f"{flask.request.args.get('before', '')}",
+            render,
+        )
     )
 
 
@@ -132,7 +189,7 @@ def theme(user: str) -> Response:
     """theme file"""
 
     return flask.Response(
-        (models.Blog.query.filter_by(username=user).first_or_404().style or "")
+        (models.cached_or_404(models.Blog, username=user).style or "")
         + f"""
 
 /* see {flask.request.url[:-10]}/post.css and {flask.request.url[:-10]}/blog.css for individual files
@@ -147,7 +204,7 @@ def blog_css(user: str) -> Response:
     """blog css"""
 
     return flask.Response(
-        (models.Blog.query.filter_by(username=user).first_or_404().style or "").split(
+        (models.cached_or_404(models.Blog, username=user).style or "").split(
             const.BLOG_POST_SECTION_DELIM, 1
         )[0],
         mimetype="text/css",
@@ -159,7 +216,7 @@ def post_css(user: str) -> Response:
     """post css"""
 
     return flask.Response(
-        (models.Blog.query.filter_by(username=user).first_or_404().style or "").replace(
+        (models.cached_or_404(models.Blog, username=user).style or "").replace(
             const.BLOG_POST_SECTION_DELIM, "", 1
         ),
         mimetype="text/css",
@@ -170,41 +227,50 @@ def post_css(user: str) -> Response:
 def sitemap(user: str) -> Response:
     """manifest"""
 
-    ftime: str = "%Y-%m-%dT%H:%M:%S+00:00"
+    user = owner(user)
 
-    posts: t.List[models.BlogPost] = (
-        models.BlogPost.query.filter_by(username=user)
-        .order_by(models.BlogPost.posted.desc())  # type: ignore
-        .all()
+    return flask.Response(
+        cache.store.coalesce(
+            f"feed:sitemap:{user}:{cache.blog_version(user)}",
+            lambda: gen_sitemap(user),
+        ),
+        mimetype="application/xml",
     )
 
+
+def gen_sitemap(user: str) -> bytes:
+    """generate the sitemap of a blog"""
+
+    ftime: str = "%Y-%m-%dT%H:%M:%S+00:00"
+
+    posts: t.List[models.PostSummary] = models.PostSummary.of(user)
+
     if not posts:
         flask.abort(404)
 
+    base: str = util.origin() + flask.url_for("blog.user_blog", user=user)
+
     root: etree.Element = etree.Element("urlset")
     root.set("xmlns", "http://www.sitemaps.org/schemas/sitemap/0.9")
 
     for file in ("robots.txt", "manifest.json", "rss.xml"):
         url: etree.Element = etree.SubElement(root, "url")
 
-        etree.SubElement(url, "loc").text = f"{flask.request.url[:-12]}/{file}"
-        etree.SubElement(url, "lastmod").text = posts[0].edited.strftime(ftime)  # type: ignore
+        etree.SubElement(url, "loc").text = f"{base}/{file}"
+        etree.SubElement(url, "lastmod").text = posts[0].edited.strftime(ftime)
         etree.SubElement(url, "priority").text = "1.0"
 
     for post in posts:
         url = etree.SubElement(root, "url")
 
-        etree.SubElement(url, "loc").text = f"{flask.request.url[:-12]}/{post.slug}"
-        etree.SubElement(url, "lastmod").text = post.edited.strftime(ftime)  # type: ignore
+        etree.SubElement(url, "loc").text = f"{base}/{post.slug}"
+        etree.SubElement(url, "lastmod").text = post.edited.strftime(ftime)
         etree.SubElement(url, "priority").text = "1.0"
 
-    return flask.Response(
-        etree.tostring(
-            root,
-            encoding="UTF-8",
-            xml_declaration=True,
-        ),
-        mimetype="application/xml",
+    return etree.tostring(
+        root,
+        encoding="UTF-8",
+        xml_declaration=True,
     )
 
 
@@ -212,7 +278,7 @@ def sitemap(user: str) -> Response:
 def manifest(user: str) -> Response:
     """manifest"""
 
-    blog: models.Blog = models.Blog.query.filter_by(username=user).first_or_404()
+    blog: models.Blog = models.cached_or_404(models.Blog, username=user)
 
     return flask.jsonify(  # type: ignore
         {
@@ -235,48 +301,59 @@ def manifest(user: str) -> Response:
 def rss(user: str) -> Response:
     """rss feed"""
 
+    user = owner(user)
+
+    return flask.Response(
+        cache.store.coalesce(
+            f"feed:rss:{user}:{cache.blog_version(user)}",
+            lambda: gen_rss(user),
+        ),
+        mimetype="application/xml+rss",
+    )
+
+
+def gen_rss(user: str) -> bytes:
+    """generate the rss feed of a blog"""
+
     ftime: str = "%a, %d %b %Y %H:%M:%S GMT"
 
-    blog: models.Blog = models.Blog.query.filter_by(username=user).first_or_404()
-    posts: t.List[models.BlogPost] = (
-        models.BlogPost.query.filter_by(username=user)
-        .order_by(models.BlogPost.posted.desc())  # type: ignore
-        .all()
+    blog: models.Blog = models.cached_or_404(models.Blog, username=user)
+    posts: t.List[models.PostSummary] = models.PostSummary.of(
+        user, const.BLOG_RSS_POSTS
     )
 
+    base: str = util.origin() + flask.url_for("blog.user_blog", user=user)
+
     root: etree.Element = etree.Element("rss")
     root.set("version", "2.0")
 
     channel: etree.Element = etree.SubElement(root, "channel")
 
     etree.SubElement(channel, "title").text = blog.title
-    etree.SubElement(channel, "link").text = flask.request.url[:-8]
+    etree.SubElement(channel, "link").text = base
     etree.SubElement(channel, "description").text = blog.description
     etree.SubElement(channel, "generator").text = "ari-web user accounts and services"
     etree.SubElement(channel, "language").text = blog.locale.lower().replace("_", "-")
 
     if posts:
-        etree.SubElement(channel, "lastBuildDate").text = posts[0].edited.strftime(ftime)  # type: ignore
+        etree.SubElement(channel, "lastBuildDate").text = posts[0].edited.strftime(ftime)
 
     for post in posts:
         item: etree.Element = etree.SubElement(channel, "item")
-        link: str = f"{flask.request.url[:-8]}/{post.slug}"
+        link: str = f"{base}/{post.slug}"
 
         etree.SubElement(item, "title").text = post.title
         etree.SubElement(item, "link").text = link
         etree.SubElement(item, "description").text = (
             post.description + f" [last edited at {post.edited}]"
         )
-        etree.SubElement(item, "pubDate").text = post.posted.strftime(ftime)  # type: ignore
+        etree.SubElement(item, "pubDate").text = post.posted.strftime(ftime)
         etree.SubElement(item, "guid").text = link
 
-    return flask.Response(
-        etree.tostring(
-            root,
-            encoding="UTF-8",
-            xml_declaration=True,
-        ),
-        mimetype="application/xml+rss",
+    return etree.tostring(
+        root,
+        encoding="UTF-8",
+        xml_declaration=True,
     )
 
 
@@ -302,19 +379,42 @@ def preview() -> str:
 
 
 @blog.get("/@<string:user>/<string:slug>")
-def show_post(user: str, slug: str) -> str:
+def show_post(user: str, slug: str) -> flask.Response:
     """show user's blog post"""
 
-    usr: models.User = models.User.query.filter_by(username=user).first_or_404()
-    blog: t.Optional[models.Blog] = usr.blog
+    if names.blogs.absent(user):
+        flask.abort(404)
 
-    return flask.render_template(
-        "blog_post.j2",
-        blog=blog,
-        post=models.BlogPost.query.filter_by(username=user, slug=slug).first_or_404(),
-        style=((blog.style or "") if blog else "").replace(
-            const.BLOG_POST_SECTION_DELIM, "", 1
-        ),
+    user = owner(user)
+
+    if cache.store.get(f"neg:post:{user}:{slug}"):
+        flask.abort(404)
+
+    def render() -> t.Union[str, t.Iterator[str]]:
+        """render the post"""
+
+        post: models.BlogPost = names.first_or_404(
+            lambda: models.cached(models.BlogPost, username=user, slug=slug),
+            f"post:{user}:{slug}",
+        )
+
+        blog: t.Optional[models.Blog] = models.cached(models.Blog, username=user)
+
+        return (  # type: ignore
+            flask.stream_template  # type: ignore
+            if len(post.content) > const.BLOG_STREAM_CONTENT
+            else flask.render_template
+        )(
+            "blog_post.j2",
+            blog=blog,
+            post=post,
+            style=((blog.style or "") if blog else "").replace(
+                const.BLOG_POST_SECTION_DELIM, "", 1
+            ),
+        )
+
+    return util.make_public(
+        stream.page(f"page:post:{user}:{slug}:{cache.blog_version(user)}", render)
     )
 
 
@@ -324,6 +424,23 @@ def show_blog_dir(user: str, slug: str) -> Response:
     return flask.redirect(flask.url_for("blog.show_post", user=user, slug=slug))
 
 
+@blog.get("/@<string:user>/~visitor")
+def visitor(user: str) -> flask.Response:
+    """the parts of blog pages which depend on the visitor ( flashed messages and
+    owner links ), fetched separately so the pages can be cached"""
+
+    parts: t.Dict[str, str] = {"messages": flask.render_template("messages.j2").strip()}
+
+    if current_user.is_authenticated and current_user.username == user:  # type: ignore
+        parts["owner"] = flask.render_template(
+            "blog_owner.j2",
+            user=user,
+            post=flask.request.args.get("post"),
+        )
+
+    return util.make_api(flask.jsonify(parts), cors=False)  # type: ignore
+
+
 @blog.get("/@<string:user>/~new")
 @util.require_role_route(const.Role.user)
 def new_post(user: str) -> str:
@@ -359,7 +476,7 @@ def new_post_create(user: str) -> Response:
         flask.abort(400)
 
     try:
-        current_user.blog.posts.append(  # type: ignore
+        models.add(
             post := models.BlogPost(
                 title,
                 keywords,
@@ -374,6 +491,9 @@ def new_post_create(user: str) -> Response:
         flask.flash(f"failed to post {title!r}")
         flask.abort(400)
 
+    cache.blog_purge(user)
+    names.forget(f"post:{user}:{post.slug}")
+
     return flask.redirect(flask.url_for("blog.show_post", user=user, slug=post.slug))
 
 
@@ -443,6 +563,7 @@ def style_blog_save(user: str) -> Response:
     try:
         current_user.blog.set_style(flask.request.form.get("css"))  # type: ignore
         models.db.session.commit()
+        cache.blog_purge(user)
     except Exception as e:
         flask.current_app.log_exception(e)
         flask.flash("failed to create blog, bad request", "error")
@@ -473,9 +594,7 @@ def preview_style_index(user: str) -> flask.Response:
                 1,
             )[0],
             blog=current_user.blog,  # type: ignore
-            posts=models.BlogPost.query.filter_by(username=user)
-            .order_by(models.BlogPost.posted.desc())  # type: ignore
-            .all(),
+            **blog_page(user),
         ),
     )
 
@@ -544,6 +663,9 @@ def nuke_commit(user: str) -> Response:
         flask.flash("failed to delete blog", "error")
         flask.abort(500)
 
+    cache.blog_purge(user)
+    names.blogs.bump()
+
     flask.flash("blog deleted", "info")
 
     return flask.redirect(flask.url_for("blog.index"))
@@ -591,6 +713,8 @@ def delete_post_commit(user: str, slug: str) -> Response:
         flask.flash("failed to delete blog post", "error")
         flask.abort(500)
 
+    cache.blog_purge(user)
+
     flask.flash("blog post deleted", "info")
 
     return flask.redirect(flask.url_for("blog.index"))
@@ -654,6 +778,8 @@ def edit_post_commit(user: str, slug: str) -> Response:
         flask.flash("failed to edit blog post", "error")
         flask.abort(500)
 
+    cache.blog_purge(user)
+
     return flask.redirect(flask.url_for("blog.show_post", user=user, slug=slug))
 
 
@@ -8,7 +8,7 @@ import flask
 from flask_login import current_user, login_required  # type: ignore
 from werkzeug.wrappers import Response
 
-from .. import const, models, util
+from .. import const, models, names, util
 from ..routing import Bp
 
 counter: Bp = Bp("counter", __name__)
@@ -43,12 +43,14 @@ def create_counter() -> flask.Response:
 
     try:
         counter: models.Counter = models.Counter(name, current_user.username, init_int, origin)  # type: ignore
-        current_user.counters.append(counter)  # type: ignore
+        models.add(counter)
         models.db.session.commit()
     except Exception:
         flask.flash("unable to create a counter")
         flask.abort(500)
 
+    names.forget(f"counter:{current_user.username}:{counter.id}")  # type: ignore
+
     return flask.redirect("@" + current_user.username + "/" + counter.id)  # type: ignore
 
 
@@ -116,7 +118,10 @@ def manage_counter(user: str, id: str) -> Response:
 def counter_text(user: str, id: str) -> flask.Response:
     """render counter as text"""
 
-    counter: models.Counter = models.Counter.query.filter_by(username=user, id=id).first_or_404()  # type: ignore
+    if names.users.absent(user):
+        flask.abort(404)
+
+    counter: models.Counter = names.first_or_404(models.Counter.query.filter_by(username=user, id=id), f"counter:{user}:{id}")  # type: ignore
     response: flask.Response = util.make_api(flask.Response(str(counter.inc_or_404().count), mimetype="text/plain"))  # type: ignore
 
     response.headers["Access-Control-Allow-Origin"] = counter.origin
@@ -142,7 +147,10 @@ def counter_svg(user: str, id: str) -> flask.Response:
         except Exception:
             pass
 
-    counter: models.Counter = models.Counter.query.filter_by(username=user, id=id).first_or_404()  # type: ignore
+    if names.users.absent(user):
+        flask.abort(404)
+
+    counter: models.Counter = names.first_or_404(models.Counter.query.filter_by(username=user, id=id), f"counter:{user}:{id}")  # type: ignore
 
     response: flask.Response = util.make_api(
         flask.Response(
@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""invalidation bus
+
+every worker binds a unix datagram socket in `BUS_DIR` and listens on it in a
+thread, `publish` sends keys to every other worker and subscribers are matched
+by key prefix, so per-process caches can be dropped as soon as another worker
+changes the data behind them"""
+
+import atexit
+import os
+import socket
+import tempfile
+import threading
+import typing as t
+
+import flask
+
+# datagrams are kept well below the default unix socket buffer size
+
+MSG_MAX: t.Final[int] = 2**12
+
+
+class Bus:
+    """cross-worker invalidation bus"""
+
+    def __init__(self) -> None:
+        self.dir: str = ""
+        self.path: str = ""
+        self.pid: int = 0
+        self.sock: t.Optional[socket.socket] = None
+        self.subs: t.List[t.Tuple[str, t.Callable[[str], None]]] = []
+        self.lock: threading.Lock = threading.Lock()
+
+    def init_app(self, app: flask.Flask) -> None:
+        """configure the bus from `app`"""
+
+        app.config.setdefault(
+            "BUS_DIR",
+            os.path.join(tempfile.gettempdir(), f"a-bus-{os.getuid()}"),
+        )
+
+        self.dir = app.config["BUS_DIR"]
+
+        if self.dir:
+            os.makedirs(self.dir, mode=0o700, exist_ok=True)
+            app.before_request(self.start)
+            atexit.register(self.stop)
+
+    def start(self) -> None:
+        """bind this worker's socket if it is not bound yet, safe to call after fork"""
+
+        if self.pid == os.getpid() or not self.dir:
+            return
+
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+
+            path: str = os.path.join(self.dir, f"{os.getpid()}.sock")
+
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+
+            sock: socket.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+            sock.bind(path)
+
+            self.sock, self.path, self.pid = sock, path, os.getpid()
+
+            threading.Thread(target=self.listen, args=(sock,), daemon=True).start()
+
+    def stop(self) -> None:
+        """unbind this worker's socket"""
+
+        if self.pid != os.getpid():
+            return
+
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+        self.pid = 0
+
+    def listen(self, sock: socket.socket) -> None:
+        """receive and dispatch keys"""
+
+        while True:
+            try:
+                data: bytes = sock.recv(MSG_MAX)
+            except OSError:
+                return
+
+            for key in data.decode("utf-8", "replace").split("\n"):
+                self.dispatch(key)
+
+    def subscribe(self, prefix: str, fn: t.Callable[[str], None]) -> None:
+        """call `fn` with every key published under `prefix`"""
+        self.subs.append((prefix, fn))
+
+    def dispatch(self, key: str) -> None:
+        """run the subscribers of `key` in this process"""
+
+        for prefix, fn in self.subs:
+            if key.startswith(prefix):
+                fn(key)
+
+    def send(self, data: bytes) -> None:
+        """send a datagram to every other worker, removing dead workers' sockets"""
+
+        try:
+            peers: t.List[str] = os.listdir(self.dir)
+        except FileNotFoundError:
+            return
+
+        sock: socket.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+
+        try:
+            for peer in peers:
+                path: str = os.path.join(self.dir, peer)
+
+                if path == self.path or not peer.endswith(".sock"):
+                    continue
+
+                try:
+                    sock.sendto(data, path)
+                except (ConnectionRefusedError, FileNotFoundError):
+                    try:
+                        os.unlink(path)
+                    except FileNotFoundError:
+                        pass
+                except OSError:  # peer queue full or similar, it will expire anyway
+                    pass
+        finally:
+            sock.close()
+
+    def publish(self, *keys: str) -> None:
+        """publish keys to all other workers"""
+
+        if not self.dir or not keys:
+            return
+
+        batch: t.List[bytes] = []
+        size: int = 0
+
+        for key in keys:
+            data: bytes = key.encode()
+
+            if size + len(data) + 1 > MSG_MAX and batch:
+                self.send(b"\n".join(batch))
+                batch, size = [], 0
+
+            batch.append(data)
+            size += len(data) + 1
+
+        self.send(b"\n".join(batch))
+
+
+hub: Bus = Bus()
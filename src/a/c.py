@@ -8,9 +8,12 @@ from io import BytesIO
 import flask_ishuman
 from pydub import AudioSegment  # type: ignore
 
+from . import trace
+
 c: flask_ishuman.IsHuman = flask_ishuman.IsHuman()
 
 
+@trace.traced("captcha")
 def audio(gen: flask_ishuman.CaptchaGenerator) -> str:
     """generate ogg audio"""
 
@@ -1,28 +1,651 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-"""cache"""
+"""cache
 
-from time import sleep
-from typing import Optional
+a small in-process lru ( l1 ) in front of memcached ( l2 ), l2 is accessed through
+a per-thread client pool behind a circuit breaker, so when memcached is down the
+cache degrades to l1 only instead of stalling workers
 
-from flask_caching import Cache
+writes and deletes are published on the invalidation bus so other workers drop
+their l1 copies right away, and workers snapshot their l1 to disk on exit so the
+next warm-up can refill memcached"""
 
-blog: Cache = Cache()
+import atexit
+import glob
+import os
+import pickle
+import secrets
+import threading
+import typing as t
+import zlib
+from collections import OrderedDict
+from hashlib import sha1
+from time import monotonic, perf_counter, sleep, time
+
+import flask
+import pylibmc  # type: ignore
+
+from . import bus, metrics, trace
+
+MISS: t.Final[t.Any] = object()
+
+# memcached limits keys to 250 bytes, not characters
+
+KEY_MAX: t.Final[int] = 200
+
+
+class LRU:
+    """thread-safe lru with per-item ttl"""
+
+    def __init__(self, size: int = 0) -> None:
+        self.size: int = size
+        self.items: "OrderedDict[str, t.Tuple[float, t.Any]]" = OrderedDict()
+        self.lock: threading.Lock = threading.Lock()
+
+    def get(self, key: str) -> t.Any:
+        """get an item or `MISS`"""
+
+        with self.lock:
+            if (item := self.items.get(key)) is None:
+                return MISS
+
+            if item[0] < monotonic():
+                del self.items[key]
+                return MISS
+
+            self.items.move_to_end(key)
+            return item[1]
+
+    def set(self, key: str, value: t.Any, timeout: float) -> None:
+        """set an item for `timeout` seconds"""
+
+        if self.size <= 0:
+            return
+
+        with self.lock:
+            self.items[key] = (monotonic() + timeout, value)
+            self.items.move_to_end(key)
+
+            while len(self.items) > self.size:
+                self.items.popitem(last=False)
+
+    def delete(self, key: str) -> None:
+        """delete an item"""
+
+        with self.lock:
+            self.items.pop(key, None)
+
+    def clear(self) -> None:
+        """delete all items"""
+
+        with self.lock:
+            self.items.clear()
+
+    def __len__(self) -> int:
+        return len(self.items)
+
+
+class Breaker:
+    """circuit breaker
+
+    opens after `threshold` consecutive failures, and after `cooldown` seconds
+    lets a single trial call through ( half-open ) which closes it again on success"""
+
+    def __init__(self, threshold: int = 5, cooldown: float = 10) -> None:
+        self.threshold: int = threshold
+        self.cooldown: float = cooldown
+        self.failures: int = 0
+        self.until: float = 0
+        self.trial: bool = False
+        self.lock: threading.Lock = threading.Lock()
+
+    @property
+    def open(self) -> bool:
+        """is the breaker open"""
+        return self.failures >= self.threshold
+
+    def allow(self) -> bool:
+        """can a call go through"""
+
+        if not self.open:
+            return True
+
+        with self.lock:
+            if self.trial or monotonic() < self.until:
+                return False
+
+            self.trial = True
+            return True
+
+    def success(self) -> None:
+        """record a successful call"""
+
+        if self.failures:
+            with self.lock:
+                self.failures = 0
+                self.trial = False
+
+    def failure(self) -> None:
+        """record a failed call"""
+
+        with self.lock:
+            self.failures += 1
+            self.trial = False
+
+            if self.open:
+                self.until = monotonic() + self.cooldown
+
+    def abort(self) -> None:
+        """end a call which neither succeeded nor failed, a trial in flight
+        gives way to another one after the cooldown"""
+
+        if self.trial:
+            with self.lock:
+                self.trial = False
+                self.until = monotonic() + self.cooldown
+
+
+class Stats:
+    """cache counters"""
+
+    def __init__(self) -> None:
+        self.lock: threading.Lock = threading.Lock()
+        self.counters: t.Dict[str, float] = dict.fromkeys(
+            (
+                "l1_hits",
+                "l2_hits",
+                "misses",
+                "sets",
+                "errors",
+                "rejected",
+                "l2_calls",
+                "l2_seconds",
+            ),
+            0,
+        )
+
+    def inc(self, name: str, value: float = 1) -> None:
+        """increment a counter"""
+
+        with self.lock:
+            self.counters[name] += value
+
+        metrics.cache_stats.labels(name).inc(value)
+
+    def json(self) -> t.Dict[str, float]:
+        """counters as json"""
+
+        with self.lock:
+            return dict(self.counters)
+
+
+class Flights:
+    """per-key locks for request coalescing within this process"""
+
+    def __init__(self) -> None:
+        self.lock: threading.Lock = threading.Lock()
+        self.locks: t.Dict[str, t.List[t.Any]] = {}
+
+    def get(self, key: str) -> threading.Lock:
+        """get and reference the lock of `key`"""
+
+        with self.lock:
+            entry: t.List[t.Any] = self.locks.setdefault(key, [threading.Lock(), 0])
+            entry[1] += 1
+            return entry[0]
+
+    def put(self, key: str) -> None:
+        """unreference the lock of `key`"""
+
+        with self.lock:
+            entry: t.List[t.Any] = self.locks[key]
+            entry[1] -= 1
+
+            if entry[1] <= 0:
+                del self.locks[key]
+
+
+class Cache:
+    """two-tier cache"""
+
+    def __init__(self) -> None:
+        self.l1: LRU = LRU()
+        self.breaker: Breaker = Breaker()
+        self.stats: Stats = Stats()
+        self.pool: t.Optional[pylibmc.ThreadMappedPool] = None
+        self.timeout: int = 300
+        self.l1_timeout: float = 5
+        self.compress: int = 2**12
+        self.fresh_timeout: int = 60
+        self.stale_timeout: int = 600
+        self.lease_timeout: int = 10
+        self.flights: Flights = Flights()
+        self.snapshot_dir: str = ""
+        self.snapshot_prefixes: t.Tuple[str, ...] = ()
+
+    def init_app(self, app: flask.Flask) -> None:
+        """configure the cache from `app`"""
+
+        app.config.setdefault("CACHE_SERVERS", ["127.0.0.1:11211"])
+        app.config.setdefault("CACHE_DEFAULT_TIMEOUT", 300)
+        app.config.setdefault("CACHE_L1_SIZE", 1024)
+        app.config.setdefault("CACHE_L1_TIMEOUT", 5)
+        app.config.setdefault("CACHE_COMPRESS_THRESHOLD", 2**12)
+        app.config.setdefault("CACHE_BREAKER_THRESHOLD", 5)
+        app.config.setdefault("CACHE_BREAKER_COOLDOWN", 10)
+        app.config.setdefault("CACHE_FRESH_TIMEOUT", 60)
+        app.config.setdefault("CACHE_STALE_TIMEOUT", 600)
+        app.config.setdefault("CACHE_NEGATIVE_TIMEOUT", 60)
+        app.config.setdefault("CACHE_LEASE_TIMEOUT", 10)
+        app.config.setdefault("CACHE_SNAPSHOT_DIR", "")
+        app.config.setdefault("CACHE_SNAPSHOT_PREFIXES", ("page:", "feed:"))
+
+        self.l1 = LRU(app.config["CACHE_L1_SIZE"])
+        self.breaker = Breaker(
+            app.config["CACHE_BREAKER_THRESHOLD"],
+            app.config["CACHE_BREAKER_COOLDOWN"],
+        )
+        self.timeout = app.config["CACHE_DEFAULT_TIMEOUT"]
+        self.l1_timeout = app.config["CACHE_L1_TIMEOUT"]
+        self.compress = app.config["CACHE_COMPRESS_THRESHOLD"]
+        self.fresh_timeout = app.config["CACHE_FRESH_TIMEOUT"]
+        self.stale_timeout = app.config["CACHE_STALE_TIMEOUT"]
+        self.lease_timeout = app.config["CACHE_LEASE_TIMEOUT"]
+        self.snapshot_dir = app.config["CACHE_SNAPSHOT_DIR"]
+        self.snapshot_prefixes = tuple(app.config["CACHE_SNAPSHOT_PREFIXES"])
+
+        if self.snapshot_dir:
+            os.makedirs(self.snapshot_dir, exist_ok=True)
+            atexit.register(self.save)
+
+        if app.config["CACHE_SERVERS"]:
+            self.pool = pylibmc.ThreadMappedPool(
+                pylibmc.Client(
+                    app.config["CACHE_SERVERS"],
+                    binary=True,
+                    behaviors={
+                        "tcp_nodelay": True,
+                        "ketama": True,
+                        "connect_timeout": 250,
+                        "send_timeout": 250000,
+                        "receive_timeout": 250000,
+                    },
+                )
+            )
+        else:
+            self.pool = None
+
+    @staticmethod
+    def key(key: str) -> str:
+        """make a memcached-safe key"""
+
+        if len(key.encode()) > KEY_MAX or not key.isprintable() or " " in key:
+            return f"h:{sha1(key.encode()).hexdigest()}"
+
+        return key
+
+    def dump(self, value: t.Any) -> bytes:
+        """serialize a value, compressing it above the threshold"""
+
+        data: bytes = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+        if len(data) > self.compress:
+            return b"z" + zlib.compress(data, 1)
+
+        return b"p" + data
+
+    @staticmethod
+    def load(data: bytes) -> t.Any:
+        """deserialize a value"""
+
+        if data[:1] == b"z":
+            return pickle.loads(zlib.decompress(data[1:]))
+
+        return pickle.loads(data[1:])
+
+    def l2(self, fn: t.Callable[[t.Any], t.Any]) -> t.Any:
+        """run `fn` with a memcached client, returns `MISS` if l2 is unavailable"""
+
+        if self.pool is None:
+            return MISS
+
+        if not self.breaker.allow():
+            self.stats.inc("rejected")
+            return MISS
+
+        start: float = perf_counter()
+
+        try:
+            with self.pool.reserve() as mc:  # type: ignore
+                ret: t.Any = fn(mc)
+        except pylibmc.Error:  # type: ignore
+            self.breaker.failure()
+            self.stats.inc("errors")
+            return MISS
+        except ValueError:
+            # rejected by the client before anything was sent ( bad keys ), which
+            # says nothing about the health of memcached
+
+            self.breaker.abort()
+            self.stats.inc("errors")
+            return MISS
+        except BaseException:
+            self.breaker.abort()
+            raise
+        finally:
+            self.stats.inc("l2_calls")
+            self.stats.inc("l2_seconds", perf_counter() - start)
+            trace.add("cache", start, perf_counter() - start)
+
+        self.breaker.success()
+        return ret
+
+    def get(self, key: str, default: t.Any = None) -> t.Any:
+        """get a value"""
+
+        key = self.key(key)
+
+        if (value := self.l1.get(key)) is not MISS:
+            self.stats.inc("l1_hits")
+            return value
+
+        data: t.Any = self.l2(lambda mc: mc.get(key))
+
+        if data is MISS or data is None:
+            self.stats.inc("misses")
+            return default
+
+        self.stats.inc("l2_hits")
+
+        value = self.load(data)
+        self.l1.set(key, value, self.l1_timeout)
+
+        return value
+
+    def set(self, key: str, value: t.Any, timeout: t.Optional[int] = None) -> None:
+        """set a value"""
+
+        key = self.key(key)
+        timeout = self.timeout if timeout is None else timeout
+        data: bytes = self.dump(value)
+
+        self.stats.inc("sets")
+        self.l1.set(key, value, min(self.l1_timeout, timeout or self.l1_timeout))
+        self.l2(lambda mc: mc.set(key, data, timeout))
+        bus.hub.publish(f"l1:{key}")
+
+    def set_many(
+        self,
+        mapping: t.Dict[str, t.Any],
+        timeout: t.Optional[int] = None,
+    ) -> None:
+        """set many values at once"""
+
+        timeout = self.timeout if timeout is None else timeout
+        data: t.Dict[str, bytes] = {}
+
+        for key, value in mapping.items():
+            key = self.key(key)
+            data[key] = self.dump(value)
+
+            self.stats.inc("sets")
+            self.l1.set(key, value, min(self.l1_timeout, timeout or self.l1_timeout))
+
+        self.l2(lambda mc: mc.set_multi(data, timeout))
+        bus.hub.publish(*(f"l1:{key}" for key in data))
+
+    def add(self, key: str, value: t.Any, timeout: t.Optional[int] = None) -> bool:
+        """set a value only if it does not exist yet, returns if it was set
+
+        without l2 this only holds within this process"""
+
+        key = self.key(key)
+        timeout = self.timeout if timeout is None else timeout
+        data: bytes = self.dump(value)
+
+        added: t.Any = self.l2(lambda mc: mc.add(key, data, timeout))
+
+        if added is MISS:
+            if self.l1.get(key) is not MISS:
+                return False
+
+            self.l1.set(key, value, timeout or self.l1_timeout)
+            return True
+
+        return bool(added)
+
+    def delete(self, *keys: str) -> None:
+        """delete values"""
+
+        mkeys: t.List[str] = [self.key(key) for key in keys]
+
+        for key in mkeys:
+            self.l1.delete(key)
+
+        self.l2(lambda mc: mc.delete_multi(mkeys))
+        bus.hub.publish(*(f"l1:{key}" for key in mkeys))
+
+    # request coalescing ( single-flight ) : values are stored with the time they
+    # stop being fresh, and are kept around for `stale_timeout` more seconds so
+    # they can be served while a single leader recomputes them
+
+    def put(self, key: str, value: t.Any, timeout: t.Optional[int] = None) -> None:
+        """store a coalesced value, fresh for `timeout` seconds"""
+
+        timeout = self.fresh_timeout if timeout is None else timeout
+        self.set(key, (time() + timeout, value), timeout + self.stale_timeout)
+
+    def peek(self, key: str) -> t.Tuple[t.Any, bool]:
+        """get a coalesced value and whether it is fresh, `MISS` if there is none"""
+
+        entry: t.Any = self.get(key, MISS)
+
+        if entry is MISS:
+            return MISS, False
+
+        return entry[1], entry[0] > time()
+
+    def acquire(self, key: str) -> bool:
+        """try to become the leader computing `key`, both within this process
+        and across workers, returns if this caller is the leader"""
+
+        lock: threading.Lock = self.flights.get(key)
+
+        if not lock.acquire(blocking=False):
+            self.flights.put(key)
+            return False
+
+        if not self.add(f"lease:{key}", os.getpid(), self.lease_timeout):
+            lock.release()
+            self.flights.put(key)
+            return False
+
+        return True
+
+    def release(self, key: str) -> None:
+        """stop being the leader of `key`"""
+
+        # leases are only read through `add`, so there is nothing to publish
+
+        lease: str = self.key(f"lease:{key}")
+        self.l1.delete(lease)
+        self.l2(lambda mc: mc.delete(lease))
+        self.flights.locks[key][0].release()
+        self.flights.put(key)
+
+    def wait(self, key: str) -> t.Any:
+        """wait for the leader of `key` to finish, returns the value or `MISS`
+        if the lease expired before a value showed up"""
+
+        lock: threading.Lock = self.flights.get(key)
+
+        try:
+            if lock.acquire(timeout=self.lease_timeout):
+                lock.release()
+        finally:
+            self.flights.put(key)
+
+        value: t.Any
+        delay: float = 0.01
+        until: float = monotonic() + self.lease_timeout
+
+        while (value := self.peek(key)[0]) is MISS and monotonic() < until:
+            sleep(delay)
+            delay = min(delay * 2, 0.25)
+
+        return value
+
+    def coalesce(
+        self,
+        key: str,
+        fn: t.Callable[[], t.Any],
+        timeout: t.Optional[int] = None,
+    ) -> t.Any:
+        """get `key` or compute it with `fn`, only one caller computes a given key
+        at a time, the others get the stale value or wait for the leader"""
+
+        value: t.Any
+        fresh: bool
+
+        value, fresh = self.peek(key)
+
+        if fresh:
+            mark("hit")
+            return value
+
+        if not self.acquire(key):
+            if value is not MISS:
+                mark("stale")
+                return value
+
+            if (value := self.wait(key)) is not MISS:
+                mark("wait")
+                return value
+
+            mark("miss")
+            value = fn()
+            self.put(key, value, timeout)
+            return value
+
+        mark("miss")
+
+        try:
+            value = fn()
+            self.put(key, value, timeout)
+        finally:
+            self.release(key)
+
+        return value
+
+    # snapshots : only coalesced values ( see `put` ) are saved, regardless of
+    # their l1 expiry, they carry their own freshness so restored pages are
+    # served stale while they are re-rendered, and are restored for what is left
+    # of their original timeout, rather than having every page miss at once
+    #
+    # version stamps are never saved, a worker which missed an invalidation
+    # would bring an outdated one back, and the entries keyed by it with it
+
+    def save(self) -> int:
+        """save this worker's l1 to the snapshot directory, returns the entry count"""
+
+        with self.l1.lock:
+            items: t.List[t.Tuple[str, t.Any]] = [
+                (key, value)
+                for key, (_, value) in self.l1.items.items()
+                if key.startswith(self.snapshot_prefixes)
+                and not key.startswith("ver:")
+                and isinstance(value, tuple)
+            ]
+
+        if not items or not self.snapshot_dir:
+            return 0
+
+        path: str = os.path.join(self.snapshot_dir, f"{os.getpid()}.pickle")
+
+        with open(f"{path}.tmp", "wb") as fp:
+            pickle.dump(items, fp, pickle.HIGHEST_PROTOCOL)
+
+        os.replace(f"{path}.tmp", path)
+
+        return len(items)
+
+    def restore(self) -> int:
+        """add all snapshots to the cache and remove them, existing entries win,
+        returns the restored entry count"""
+
+        restored: int = 0
+
+        for path in glob.glob(os.path.join(self.snapshot_dir, "*.pickle")):
+            try:
+                with open(path, "rb") as fp:
+                    items: t.List[t.Tuple[str, t.Any]] = pickle.load(fp)
+            except Exception:
+                items = []
+
+            for key, value in items:
+                timeout: int = int(value[0] + self.stale_timeout - time())
+
+                if timeout > 0 and not key.startswith("ver:"):
+                    restored += self.add(key, value, timeout)
+
+            os.remove(path)
+
+        return restored
+
+
+def mark(status: str) -> None:
+    """record how the current request was served from the cache"""
+
+    if flask.has_request_context():  # type: ignore
+        flask.g.cache = status
+
+
+store: Cache = Cache()
+bus.hub.subscribe("l1:", lambda key: store.l1.delete(key[3:]))
 
 
 def blog_set(user: str, ctx: str, data: str) -> None:
     """creates a blog cache"""
-    try:
-        blog.set(f"{user}_{ctx}", data)  # type: ignore
-    except Exception:
-        sleep(0.5)
-        return blog_set(user, ctx, data)
+    store.set(f"blog:{user}:{ctx}", data)
 
 
-def blog_get(user: str, ctx: str) -> Optional[str]:
+def blog_get(user: str, ctx: str) -> t.Optional[str]:
     """does blog cache have this users context"""
-    try:
-        return blog.get(f"{user}_{ctx}")  # type: ignore
-    except Exception:
-        sleep(0.5)
-        return blog_get(user, ctx)
+    return store.get(f"blog:{user}:{ctx}")
+
+
+def blog_version(user: str) -> str:
+    """get the version of a blog, cached pages and feeds of a blog are keyed by it"""
+
+    key: str = f"ver:blog:{user}"
+
+    if (version := store.get(key)) is None:
+        store.add(key, secrets.token_hex(8), 0)
+        version = store.get(key) or "0"
+
+    return version
+
+
+def blog_purge(user: str) -> None:
+    """purge all cached pages and feeds of a blog"""
+
+    store.set(f"ver:blog:{user}", secrets.token_hex(8), 0)
+    store.delete("feed:sitemap", "feed:robots")
+
+
+def user_version(user: str) -> t.Optional[str]:
+    """get the version of a user, session snapshots of the user are stamped with
+    it, `None` if it is unknown"""
+
+    key: str = f"ver:user:{user}"
+
+    if (version := store.get(key)) is None:
+        store.add(key, secrets.token_hex(8), 0)
+        version = store.get(key)
+
+    return version
+
+
+def user_bump(user: str) -> None:
+    """outdate all session snapshots of a user"""
+    store.set(f"ver:user:{user}", secrets.token_hex(8), 0)
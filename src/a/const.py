@@ -6,7 +6,9 @@ from enum import Enum, auto
 from typing import Dict, Final, List, Tuple
 
 PIN_LEN: Final[int] = 6
-ID_LEN: Final[int] = 64
+ID_LEN: Final[int] = 64  # column length, ids made before `ID_BYTES` are this long
+ID_BYTES: Final[int] = 16  # 22 characters of base64url
+ID_ATTEMPTS: Final[int] = 3
 NAME_LEN: Final[int] = 256
 APP_SECRET_LEN: Final[int] = 512
 USERNAME_LEN: Final[int] = 256
@@ -36,6 +38,13 @@ BLOG_COMMENT_URL_LEN: Final[int] = 196
 BLOG_VISITOR_URL_LEN: Final[int] = 196
 
 BLOG_POST_MAX: Final[int] = 1024
+BLOG_PAGE_POSTS: Final[int] = 64
+BLOG_RSS_POSTS: Final[int] = 32
+
+BLOG_STREAM_CONTENT: Final[int] = 4096
+
+WARM_BLOGS: Final[int] = 64
+WARM_POSTS: Final[int] = 256
 
 MARKDOWN_EXTS: Final[List[str]] = [
     "speedup",
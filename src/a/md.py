@@ -17,6 +17,7 @@ from pygments.token import (Comment, Error, Generic, Keyword, Literal, Name,
                             Number, Operator, Punctuation, String, Token)
 from web_mini.css import minify_css
 
+from . import trace
 from .const import BLOG_POST_SLUG_LEN, CONTEXT_WORDS, MARKDOWN_EXTS, CodeTheme
 
 TITLE_LINKS_RE: t.Final[str] = r"<#:[^>]+?>"
@@ -147,6 +148,7 @@ class BlogRenderer(mistune.HTMLRenderer):
         return "<pre><code>" + mistune.escape(code) + "</code></pre>"
 
 
+@trace.traced("md")
 def markdown(md: str) -> str:
     return mistune.create_markdown(  # type: ignore
         plugins=MARKDOWN_EXTS + [titlelink],
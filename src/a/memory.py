@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""memory diagnostics
+
+tracemalloc snapshots and diffs, and the sizes of the known caches, everything is
+per worker so consecutive requests may be answered by different workers, the
+admin endpoints report the pid and take it back to pin a request to one worker"""
+
+import gc
+import os
+import tracemalloc
+import typing as t
+
+caches: t.Dict[str, t.Callable[[], t.Any]] = {}
+baseline: t.Optional[tracemalloc.Snapshot] = None
+
+# allocations made by the diagnostics themselves are not interesting
+
+FILTERS: t.Final[t.Tuple[tracemalloc.Filter, ...]] = (
+    tracemalloc.Filter(False, tracemalloc.__file__),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+    tracemalloc.Filter(False, "<frozen importlib._bootstrap_external>"),
+    tracemalloc.Filter(False, "<unknown>"),
+)
+
+
+def register(name: str, fn: t.Callable[[], t.Any]) -> None:
+    """report the size of a cache as `fn()`"""
+    caches[name] = fn
+
+
+def lru(fn: t.Any) -> t.Callable[[], t.Dict[str, t.Any]]:
+    """size of an `lru_cache`"""
+    return lambda: fn.cache_info()._asdict()
+
+
+def rss() -> int:
+    """resident set size of this process in bytes"""
+
+    with open("/proc/self/statm", "r") as fp:
+        return int(fp.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+
+
+def cache_sizes() -> t.Dict[str, t.Any]:
+    """sizes of all registered caches"""
+
+    sizes: t.Dict[str, t.Any] = {}
+
+    for name, fn in caches.items():
+        try:
+            sizes[name] = fn()
+        except Exception as e:
+            sizes[name] = f"error : {e!r}"
+
+    return sizes
+
+
+def status() -> t.Dict[str, t.Any]:
+    """memory status of this worker"""
+
+    current, peak = tracemalloc.get_traced_memory()
+
+    return {
+        "pid": os.getpid(),
+        "rss": rss(),
+        "tracing": tracemalloc.is_tracing(),
+        "traced": {"current": current, "peak": peak},
+        "baseline": baseline is not None,
+        "gc": gc.get_count(),
+        "caches": cache_sizes(),
+    }
+
+
+def start(frames: int = 1) -> None:
+    """start tracing allocations"""
+
+    if not tracemalloc.is_tracing():
+        tracemalloc.start(frames)
+
+
+def stop() -> None:
+    """stop tracing allocations and drop the baseline"""
+
+    global baseline
+
+    baseline = None
+    tracemalloc.stop()
+
+
+def snapshot() -> tracemalloc.Snapshot:
+    """take a filtered snapshot"""
+    return tracemalloc.take_snapshot().filter_traces(FILTERS)
+
+
+def mark() -> None:
+    """take a baseline snapshot"""
+
+    global baseline
+    baseline = snapshot()
+
+
+def diff(limit: int = 25, group: str = "lineno") -> t.List[t.Dict[str, t.Any]]:
+    """top allocation differences since the baseline, grouped by `group`
+    ( lineno or filename )"""
+
+    if baseline is None:
+        return []
+
+    return [
+        {
+            "file": stat.traceback[0].filename,
+            "line": stat.traceback[0].lineno,
+            "size": stat.size,
+            "size_diff": stat.size_diff,
+            "count": stat.count,
+            "count_diff": stat.count_diff,
+        }
+        for stat in snapshot().compare_to(baseline, group)[:limit]
+    ]
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""prometheus metrics
+
+values are aggregated across gunicorn workers when PROMETHEUS_MULTIPROC_DIR is
+set before the workers start ( see scripts/run.sh ), otherwise every process
+only reports its own"""
+
+import hmac
+import os
+import secrets
+import typing as t
+from time import perf_counter
+
+import flask
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+from . import const, query, util
+
+LATENCY_BUCKETS: t.Final[t.Tuple[float, ...]] = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+)
+SIZE_BUCKETS: t.Final[t.Tuple[float, ...]] = tuple(2**n for n in range(8, 24, 2))
+
+requests: Counter = Counter(
+    "a_http_requests_total",
+    "http requests",
+    ("endpoint", "method", "status"),
+)
+latency: Histogram = Histogram(
+    "a_http_request_seconds",
+    "time until the response starts",
+    ("endpoint", "method"),
+    buckets=LATENCY_BUCKETS,
+)
+sizes: Histogram = Histogram(
+    "a_http_response_bytes",
+    "response sizes, streamed responses are not counted",
+    ("endpoint",),
+    buckets=SIZE_BUCKETS,
+)
+in_flight: Gauge = Gauge(
+    "a_http_requests_in_flight",
+    "requests being handled",
+    multiprocess_mode="livesum",
+)
+db_queries: Histogram = Histogram(
+    "a_db_query_seconds",
+    "database query time",
+    buckets=LATENCY_BUCKETS,
+)
+cache_stats: Counter = Counter(
+    "a_cache",
+    "cache events, l2_seconds is the total time spent in memcached",
+    ("stat",),
+)
+argon2: Histogram = Histogram(
+    "a_argon2_seconds",
+    "argon2 hashing and verification time",
+    ("op",),
+    buckets=(0.01, 0.05, 0.1, 0.25, 0.5, 1, 2, 4, 8),
+)
+minify: Histogram = Histogram(
+    "a_minify_seconds",
+    "html minification time",
+    buckets=LATENCY_BUCKETS,
+)
+worker_rss: Gauge = Gauge(
+    "a_worker_rss_bytes",
+    "resident set size of each worker",
+    multiprocess_mode="liveall",
+)
+worker_recycles: Counter = Counter(
+    "a_worker_recycles",
+    "workers recycled by the memory watchdog",
+)
+
+
+def endpoint() -> str:
+    """endpoint label of the current request"""
+
+    rule: t.Any = flask.request.url_rule
+    return rule.endpoint if rule is not None else "none"
+
+
+def collect() -> bytes:
+    """render all metrics in the prometheus text format"""
+
+    if "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        return generate_latest(REGISTRY)
+
+    registry: CollectorRegistry = CollectorRegistry()
+    multiprocess.MultiProcessCollector(registry)
+    return generate_latest(registry)
+
+
+def view() -> flask.Response:
+    """metrics, for admins or with the bearer token in `METRICS_TOKEN_FILE`"""
+
+    auth: str = flask.request.headers.get("Authorization", "")
+
+    if not (
+        auth[:7] == "Bearer "
+        and hmac.compare_digest(
+            auth[7:].encode(), flask.current_app.config["METRICS_TOKEN"]
+        )
+    ) and not util.require_role(const.Role.admin):
+        flask.abort(403)
+
+    return util.make_api(
+        flask.Response(collect(), mimetype=CONTENT_TYPE_LATEST),
+        cors=False,
+    )
+
+
+def init_app(app: flask.Flask) -> None:
+    """instrument `app`, call before other request hooks are registered"""
+
+    app.config.setdefault("METRICS_TOKEN_FILE", "metrics.key")
+
+    if not os.path.exists(app.config["METRICS_TOKEN_FILE"]):
+        with open(app.config["METRICS_TOKEN_FILE"], "w") as fp:
+            fp.write(secrets.token_urlsafe(32))
+
+    with open(app.config["METRICS_TOKEN_FILE"], "rb") as fp:
+        app.config["METRICS_TOKEN"] = fp.read().strip()
+
+    @app.before_request
+    def _() -> None:
+        """start timing the request"""
+
+        flask.g.metrics_start = perf_counter()
+        in_flight.inc()
+
+    @app.after_request
+    def _(response: flask.Response) -> flask.Response:
+        """count the response"""
+
+        flask.g.metrics_status = response.status_code
+
+        if not response.is_streamed and (size := response.content_length) is not None:
+            sizes.labels(endpoint()).observe(size)
+
+        return response
+
+    @app.teardown_request
+    def _(_: t.Optional[BaseException]) -> None:
+        """stop timing the request"""
+
+        if (start := flask.g.pop("metrics_start", None)) is None:
+            return
+
+        in_flight.dec()
+
+        name: str = endpoint()
+        method: str = flask.request.method
+
+        latency.labels(name, method).observe(perf_counter() - start)
+        requests.labels(name, method, str(flask.g.pop("metrics_status", 500))).inc()
+
+    query.listen(lambda _, seconds: db_queries.observe(seconds))
+
+    app.add_url_rule("/metrics", "metrics", view, methods=("GET",))
@@ -2,7 +2,9 @@
 # -*- coding: utf-8 -*-
 """models"""
 
+import itertools
 import random
+import re
 import typing as t
 from base64 import b85encode, urlsafe_b64encode
 from datetime import datetime
@@ -16,15 +18,39 @@ from flask_argon2 import Argon2  # type: ignore
 from flask_login import UserMixin  # type: ignore
 from flask_sqlalchemy import SQLAlchemy
 from readtime import of_markdown as read_time_of_markdown  # type: ignore
-from sqlalchemy import DECIMAL, DateTime, Dialect, Enum, TypeDecorator, Unicode
-from sqlalchemy.orm import Relationship, relationship
-
-from . import const, md, types, util
+from sqlalchemy import (
+    DECIMAL,
+    DateTime,
+    Dialect,
+    Enum,
+    TypeDecorator,
+    Unicode,
+    and_,
+    event,
+    func,
+    inspect,
+    or_,
+    select,
+    true,
+)
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import (
+    Mapped,
+    Relationship,
+    joinedload,
+    make_transient_to_detached,
+    relationship,
+)
+from sqlalchemy.orm.attributes import set_committed_value  # type: ignore
+
+from . import cache, const, md, metrics, trace, types, util
 
 db: SQLAlchemy = SQLAlchemy()
 argon2: Argon2 = Argon2()
 rand: SystemRandom = SystemRandom()
 
+CURSOR_RE: t.Final[re.Pattern[str]] = re.compile(r"\d{20}-[\w-]{1,%d}" % const.ID_LEN)
+
 
 class HugeUInt(TypeDecorator):  # type: ignore
     """huge int type, 0 to (10**64)-1"""
@@ -62,6 +88,195 @@ class HugeUInt(TypeDecorator):  # type: ignore
         return Decimal(value) if value is not None else None
 
 
+def memo(key: t.Hashable, load: t.Callable[[], t.Any]) -> t.Any:
+    """`load()` at most once per request, see `forget`"""
+
+    if not flask.has_app_context():  # type: ignore
+        return load()
+
+    memos: t.Dict[t.Hashable, t.Any] = flask.g.setdefault("memo", {})
+
+    if key not in memos:
+        memos[key] = load()
+
+    return memos[key]
+
+
+@event.listens_for(db.session, "after_commit")
+@event.listens_for(db.session, "after_rollback")
+def forget(*_: t.Any) -> None:
+    """forget the memoised entities, they may have changed or been deleted"""
+
+    if flask.has_app_context():  # type: ignore
+        flask.g.pop("memo", None)
+
+
+# read-through row cache : rows are cached as their column values by the
+# columns in `ROW_KEYS`, except the ones in `ROW_PRIVATE`, and only ever added,
+# when a row is inserted, updated or deleted its keys are overwritten with a
+# marker, at the flush and again after the commit, which keeps other requests
+# which read the old row before the commit from caching it until the marker
+# expires `lease_timeout` seconds after the commit
+
+
+def row_key(model: t.Any, by: t.Dict[str, t.Any]) -> str:
+    """cache key of a `model` row looked up `by` some columns"""
+    return f"row:{model.__tablename__}:" + ":".join(
+        f"{column}={by[column]}" for column in sorted(by)
+    )
+
+
+def row_keys(target: t.Any) -> t.Set[str]:
+    """cache keys of a row, by its current and previous values"""
+
+    state: t.Any = inspect(target)
+    keys: t.Set[str] = set()
+
+    # an expired primary key is still known from the identity of the row
+
+    identity: t.Dict[str, t.Any] = dict(
+        zip(
+            (column.key for column in state.mapper.primary_key),
+            state.identity or (),
+        )
+    )
+
+    for columns in ROW_KEYS[type(target)]:
+        values: t.List[t.Set[t.Any]] = []
+
+        for column in columns:
+            history: t.Any = state.attrs[column].history
+            values.append(
+                {*history.added, *history.unchanged, *history.deleted}
+                or {identity.get(column)}
+            )
+            values[-1].discard(None)
+
+        keys.update(
+            row_key(type(target), dict(zip(columns, combination)))
+            for combination in itertools.product(*values)
+        )
+
+    return keys
+
+
+def row_get(model: t.Any, by: t.Dict[str, t.Any]) -> t.Any:
+    """get a `model` row looked up `by` some columns from the row cache only,
+    `None` on a miss"""
+
+    if not flask.current_app.config["ROW_CACHE_TIMEOUT"]:
+        return None
+
+    values: t.Dict[str, t.Any] = cache.store.get(row_key(model, by))
+
+    if not isinstance(values, dict):  # type: ignore
+        return None
+
+    # the session may already have the row, possibly with changes
+
+    identity: t.Any = model.__mapper__.identity_key_from_primary_key(
+        [values[column.key] for column in model.__mapper__.primary_key]
+    )
+
+    if (obj := db.session.identity_map.get(identity)) is not None:
+        return obj
+
+    obj = model.__mapper__.class_manager.new_instance()
+
+    for name, value in values.items():
+        set_committed_value(obj, name, value)
+
+    make_transient_to_detached(obj)
+
+    return db.session.merge(obj, load=False)
+
+
+def row_set(obj: t.Any, by: t.Iterable[str]) -> None:
+    """cache a row loaded from the database, looked up `by` some columns"""
+
+    model: t.Any = obj.__class__
+    timeout: int = flask.current_app.config["ROW_CACHE_TIMEOUT"]
+
+    # the row is cached by its own values, which are the ones it is expired
+    # by, a lookup spelled differently ( the collation is case insensitive )
+    # just misses, and rows changed by this transaction are not committed yet
+
+    key: str = row_key(model, {column: getattr(obj, column) for column in by})
+
+    if (
+        timeout
+        and not inspect(obj).modified
+        and key not in db.session.info.get("rows", ())
+    ):
+        cache.store.add(
+            key,
+            {
+                attr.key: getattr(obj, attr.key)
+                for attr in model.__mapper__.column_attrs
+                if attr.key not in ROW_PRIVATE.get(model, ())
+            },
+            timeout,
+        )
+
+
+def cached(model: t.Any, **by: t.Any) -> t.Any:
+    """get a `model` row by its primary key or a unique key through the row
+    cache, `None` if there is no such row"""
+
+    assert tuple(sorted(by)) in (
+        tuple(sorted(columns)) for columns in ROW_KEYS[model]
+    ), f"{model.__name__} is not cached by {', '.join(by)}"
+
+    obj: t.Any
+
+    if (obj := row_get(model, by)) is None:
+        if (obj := model.query.filter_by(**by).first()) is not None:
+            row_set(obj, by)
+
+    return obj
+
+
+def cached_or_404(model: t.Any, **by: t.Any) -> t.Any:
+    """`cached`, but abort with a 404 if there is no such row"""
+
+    if (obj := cached(model, **by)) is None:
+        flask.abort(404)
+
+    return obj
+
+
+def hold_rows(keys: t.Iterable[str]) -> None:
+    """overwrite cached rows with a marker nothing can be added over"""
+    cache.store.set_many(dict.fromkeys(keys, "-"), cache.store.lease_timeout)
+
+
+def expire_row(_: t.Any, __: t.Any, target: t.Any) -> None:
+    """hold the cached row of `target`, on insert, update and delete"""
+
+    keys: t.Set[str] = row_keys(target)
+    db.session.info.setdefault("rows", set()).update(keys)
+    hold_rows(keys)
+
+
+@event.listens_for(db.session, "after_commit")
+def expire_rows(session: t.Any) -> None:
+    """hold the cached rows changed by the transaction again, from the commit on"""
+
+    if keys := session.info.pop("rows", None):
+        hold_rows(keys)
+
+
+@event.listens_for(db.session, "after_rollback")
+def keep_rows(session: t.Any) -> None:
+    """the rows did not change, unless only a savepoint was rolled back"""
+
+    if session.in_nested_transaction():
+        return
+
+    if keys := session.info.pop("rows", None):
+        cache.store.delete(*keys)
+
+
 def gen_pin() -> str:
     """generate a pin"""
     return "".join(rand.choices(digits, k=const.PIN_LEN))
@@ -74,32 +289,60 @@ def gen_secret() -> str:
 
 def hash_data(data: str) -> str:
     """hash data"""
-    return argon2.generate_password_hash(data)  # type: ignore
+
+    with metrics.argon2.labels("hash").time(), trace.span("argon2"):
+        return argon2.generate_password_hash(data)  # type: ignore
 
 
 def hash_verify(data: str, h: str) -> bool:
     """hash data"""
-    return argon2.check_password_hash(h, data)  # type: ignore
+
+    with metrics.argon2.labels("verify").time(), trace.span("argon2"):
+        return argon2.check_password_hash(h, data)  # type: ignore
 
 
-def gen_id(model: t.Any) -> str:  # type: ignore
-    """generate an id"""
+def gen_id() -> str:
+    """generate an id, `const.ID_BYTES` random bytes are unique enough to not
+    check the database, see `add`"""
+    return urlsafe_b64encode(rand.randbytes(const.ID_BYTES)).decode("ascii").rstrip("=")
 
-    while True:
-        generated_id: str = urlsafe_b64encode(rand.randbytes(const.ID_LEN)).decode(
-            "ascii"
-        )[: const.ID_LEN]
 
+def add(obj: t.Any) -> None:
+    """add a new row with a generated id and flush it, the primary key catches
+    id collisions, which are retried with a new id"""
+
+    for attempt in range(const.ID_ATTEMPTS):
         try:
-            if not model.query.filter_by(id=generated_id).first():  # type: ignore
-                return generated_id
-        except Exception:
-            continue
+            with db.session.begin_nested():
+                db.session.add(obj)
+
+            return
+        except IntegrityError:
+            # other constraints ( unique slugs, foreign keys ) do not go away
+            # with a new id, the error names the constraint differently on every
+            # database, so the id is checked instead
+
+            if (
+                attempt + 1 >= const.ID_ATTEMPTS
+                or db.session.get(obj.__class__, obj.id) is None
+            ):
+                raise
+
+            obj.id = gen_id()
 
 
 class BlogPost(db.Model):
     """user blog post"""
 
+    # posts are looked up by ( username, slug ), listed by username newest first,
+    # and slugs are checked globally for collisions
+
+    __table_args__ = (
+        db.Index("ix_blog_post_username_slug", "username", "slug", unique=True),
+        db.Index("ix_blog_post_username_posted", "username", "posted"),
+        db.Index("ix_blog_post_slug", "slug"),
+    )
+
     id: str = db.Column(
         db.String(const.ID_LEN),
         primary_key=True,
@@ -152,7 +395,7 @@ class BlogPost(db.Model):
     ) -> None:
         assert len(self.query.filter_by(username=username).all()) <= const.BLOG_POST_MAX, "too many counters"  # type: ignore
 
-        self.id: str = gen_id(self)
+        self.id: str = gen_id()
         self.set_slug(title)
         self.set_slug(title)
         self.set_title(title)
@@ -216,6 +459,117 @@ class BlogPost(db.Model):
             return False
 
 
+class PostSummary:
+    """a blog post without its content, for listings
+
+    loaded with a core select, so they are not tracked by the session"""
+
+    __slots__ = "id", "slug", "title", "description", "posted", "edited", "username"
+
+    def __init__(
+        self,
+        id: str,
+        slug: str,
+        title: str,
+        description: str,
+        posted: datetime,
+        edited: datetime,
+        username: str,
+    ) -> None:
+        self.id: str = id
+        self.slug: str = slug
+        self.title: str = title
+        self.description: str = description
+        self.posted: datetime = posted
+        self.edited: datetime = edited
+        self.username: str = username
+
+    @property
+    def cursor(self) -> str:
+        """keyset pagination cursor pointing after this post"""
+        return f"{self.posted:%Y%m%d%H%M%S%f}-{self.id}"
+
+    @staticmethod
+    def parse_cursor(cursor: str) -> t.Optional[t.Tuple[datetime, str]]:
+        """parse a cursor into ( posted, id ), none if it is invalid"""
+
+        if CURSOR_RE.fullmatch(cursor) is None:
+            return None
+
+        posted, id = cursor.split("-", 1)
+
+        try:
+            return datetime.strptime(posted, "%Y%m%d%H%M%S%f"), id
+        except ValueError:
+            return None
+
+    @staticmethod
+    def columns() -> t.Any:
+        """columns of the posts table"""
+        return BlogPost.__table__.c  # type: ignore
+
+    @staticmethod
+    def older(before: t.Optional[t.Tuple[datetime, str]]) -> t.Any:
+        """condition for the posts after the cursor `before` in listing order"""
+
+        columns: t.Any = PostSummary.columns()
+
+        if before is None:
+            return true()
+
+        return or_(
+            columns.posted < before[0],
+            and_(columns.posted == before[0], columns.id < before[1]),
+        )
+
+    @classmethod
+    def statement(
+        cls,
+        username: str,
+        limit: t.Optional[int] = None,
+        before: t.Optional[t.Tuple[datetime, str]] = None,
+    ) -> t.Any:
+        """select up to `limit` summaries after the cursor `before`, newest first
+
+        ( username, posted ) is a range scan, innodb secondary indexes end with
+        the primary key so the id tie break is covered too"""
+
+        columns: t.Any = cls.columns()
+
+        return (
+            select(*(columns[name] for name in cls.__slots__))
+            .where(columns.username == username, cls.older(before))
+            .order_by(columns.posted.desc(), columns.id.desc())
+            .limit(limit)
+        )
+
+    @classmethod
+    def of(
+        cls,
+        username: str,
+        limit: t.Optional[int] = None,
+        before: t.Optional[t.Tuple[datetime, str]] = None,
+    ) -> t.List["PostSummary"]:
+        """summaries of the posts of a blog, newest first"""
+        return [cls(*row) for row in db.session.execute(cls.statement(username, limit, before))]
+
+    @classmethod
+    def count(
+        cls,
+        username: str,
+        before: t.Optional[t.Tuple[datetime, str]] = None,
+    ) -> int:
+        """count the posts of a blog after the cursor `before`"""
+
+        columns: t.Any = cls.columns()
+
+        return db.session.execute(
+            select(func.count())
+            .select_from(BlogPost.__table__)  # type: ignore
+            .where(columns.username == username, cls.older(before))
+        ).scalar_one()
+
+
 class Blog(db.Model):
     """blog"""
 
@@ -413,6 +767,8 @@ class Blog(db.Model):
 class Counter(db.Model):
     """user counter"""
 
+    __table_args__ = (db.Index("ix_counter_username_id", "username", "id"),)
+
     id: str = db.Column(
         db.String(const.ID_LEN),
         primary_key=True,
@@ -449,7 +805,7 @@ class Counter(db.Model):
         assert len(self.query.filter_by(username=username).all()) <= const.COUNTERS_LIMIT, "too many counters"  # type: ignore
         assert count <= const.HUGEINT_MAX, "count out of range"
 
-        self.id: str = gen_id(self)
+        self.id: str = gen_id()
         self.set_name(name)
         self.count: int = count
         self.username: str = username
@@ -562,6 +918,8 @@ class Counter(db.Model):
 class App(db.Model):
     """user app"""
 
+    __table_args__ = (db.Index("ix_app_username_id", "username", "id"),)
+
     id: str = db.Column(
         db.String(const.ID_LEN),
         primary_key=True,
@@ -594,7 +952,7 @@ class App(db.Model):
         assert len(name) <= const.NAME_LEN, "name too long"
         assert len(self.query.filter_by(username=username).all()) <= const.APPS_LIMIT, "too many apps"  # type: ignore
 
-        self.id: str = gen_id(self)
+        self.id: str = gen_id()
         self.name: str = name
         self.public: bool = public
 
@@ -665,15 +1023,14 @@ class User(UserMixin, db.Model):
         lazy="dynamic",
     )
 
-    @property
-    def blog(self) -> t.Optional[Blog]:
-        """get blog"""
-        return Blog.query.filter_by(username=self.username).first()  # type: ignore
+    # a `Relationship` annotation makes the loader dynamic, which one-to-one
+    # relationships cannot use
 
-    @blog.setter
-    def blog(self, value: Blog) -> t.Optional[Blog]:
-        """get blog"""
-        db.session.add(value)
+    blog: Mapped[t.Optional[Blog]] = relationship(
+        "Blog",
+        uselist=False,
+        lazy="select",
+    )
 
     def __init__(self, username: str, password: str, pin: str) -> None:
         assert self.check_username(username), "invalid username"
@@ -727,9 +1084,49 @@ class User(UserMixin, db.Model):
         return hash_verify(pin, self.pin_hash)
 
     @staticmethod
-    def get_by_user(username: str) -> "t.Optional[User]":
-        """gets user by username"""
-        return db.session.get(User, username)
+    def get_by_user(username: str, blog: bool = False) -> "t.Optional[User]":
+        """gets user by username, `blog` loads the blog along with it"""
+
+        user: t.Optional[User] = memo(
+            ("user", username),
+            lambda: User.load(username, blog),
+        )
+
+        # the user may have been memoised without its blog
+
+        if blog and user is not None and "blog" not in inspect(user).dict:  # type: ignore
+            set_committed_value(user, "blog", cached(Blog, username=username))
+
+        return user
+
+    @staticmethod
+    def load(username: str, blog: bool = False) -> "t.Optional[User]":
+        """load a user through the row cache, `blog` loads the blog along with it,
+        from the row cache if both rows are cached, otherwise joined into a
+        single query whose rows are cached"""
+
+        if not blog:
+            return cached(User, username=username)
+
+        user: t.Optional[User] = row_get(User, {"username": username})
+
+        if user is not None:
+            if "blog" in inspect(user).dict:  # type: ignore
+                return user
+
+            if (row := row_get(Blog, {"username": username})) is not None:
+                set_committed_value(user, "blog", row)
+                return user
+
+        user = db.session.get(User, username, options=[joinedload(User.blog)])
+
+        if user is not None:
+            row_set(user, ("username",))
+
+            if user.blog is not None:
+                row_set(user.blog, ("username",))
+
+        return user
 
     def get_id(self) -> str:
         """get id"""
@@ -765,3 +1162,141 @@ class User(UserMixin, db.Model):
             flask.current_app.log_exception(e)
             db.session.rollback()
             return False
+
+
+class UserSnapshot:
+    """the signed in user as stored in the session ( which is signed ), so
+    requests needing only `SNAPSHOT_FIELDS` do not load the user
+
+    a snapshot is trusted while its version matches `cache.user_version`, which
+    is bumped whenever the user changes, any other attribute loads the user"""
+
+    SNAPSHOT_FIELDS: t.Final[t.Tuple[str, ...]] = ("username", "role", "limited")
+
+    __slots__: t.Tuple[str, ...] = ("fields", "user")
+
+    fields: t.Dict[str, t.Any]
+    user: "t.Optional[User]"
+
+    is_authenticated: bool = True
+    is_active: bool = True
+    is_anonymous: bool = False
+
+    def __init__(self, fields: t.Dict[str, t.Any]) -> None:
+        object.__setattr__(self, "fields", fields)
+        object.__setattr__(self, "user", None)
+
+    @staticmethod
+    def load(username: str) -> "t.Optional[UserSnapshot]":
+        """the session snapshot of `username`, `None` if there is none or it
+        is outdated"""
+
+        snapshot: t.Dict[str, t.Any] = flask.session.get("_snapshot")  # type: ignore
+
+        if (
+            not isinstance(snapshot, dict)  # type: ignore
+            or snapshot.get("username") != username
+            or snapshot.get("version") is None
+            or snapshot["version"] != cache.user_version(username)
+        ):
+            return None
+
+        return UserSnapshot(
+            {
+                "username": username,
+                "role": const.Role(snapshot["role"]),
+                "limited": snapshot["limited"],
+            }
+        )
+
+    @staticmethod
+    def save(user: "User") -> None:
+        """store the snapshot of `user` in the session"""
+
+        if (version := cache.user_version(user.username)) is None:
+            return
+
+        flask.session["_snapshot"] = {
+            "username": user.username,
+            "role": user.role.value,
+            "limited": bool(user.limited),
+            "version": version,
+        }
+
+    def get_id(self) -> str:
+        """get id"""
+        return self.fields["username"]
+
+    def get_user(self) -> "User":
+        """load the user this is a snapshot of"""
+
+        if self.user is None:
+            user: t.Optional[User] = User.get_by_user(
+                self.fields["username"],
+                flask.current_app.config["USER_JOIN_BLOG"],
+            )
+
+            if user is None:
+                flask.abort(401)
+
+            object.__setattr__(self, "user", user)
+
+        return self.user  # type: ignore
+
+    def __getattr__(self, name: str) -> t.Any:
+        if name in self.SNAPSHOT_FIELDS and self.user is None:
+            return self.fields[name]
+
+        return getattr(self.get_user(), name)
+
+    def __setattr__(self, name: str, value: t.Any) -> None:
+        setattr(self.get_user(), name, value)
+
+
+def expire_snapshot(_: t.Any, __: t.Any, target: "User") -> None:
+    """outdate the session snapshots of a changed or deleted user"""
+
+    db.session.info.setdefault("users", set()).add(target.username)
+    cache.user_bump(target.username)
+
+
+@event.listens_for(db.session, "after_commit")
+def expire_snapshots(session: t.Any) -> None:
+    """outdate the session snapshots of the users changed by the transaction
+    again"""
+
+    for username in session.info.pop("users", ()):
+        cache.user_bump(username)
+
+
+@event.listens_for(db.session, "after_rollback")
+def keep_snapshots(session: t.Any) -> None:
+    """the users did not change, unless only a savepoint was rolled back"""
+
+    if session.in_nested_transaction():
+        return
+
+    session.info.pop("users", None)
+
+
+# rows read through `cached`, by the columns they are looked up by
+
+ROW_KEYS: t.Final[t.Dict[t.Any, t.Tuple[t.Tuple[str, ...], ...]]] = {
+    User: (("username",),),
+    Blog: (("username",),),
+    BlogPost: (("id",), ("username", "slug")),
+    App: (("id",),),
+}
+
+# columns never cached, they are loaded from the database when accessed
+
+ROW_PRIVATE: t.Final[t.Dict[t.Any, t.Tuple[str, ...]]] = {
+    User: ("password_hash", "pin_hash"),
+}
+
+for model in ROW_KEYS:
+    for name in ("after_insert", "after_update", "after_delete"):
+        event.listen(model, name, expire_row)
+
+event.listen(User, "after_update", expire_snapshot)
+event.listen(User, "after_delete", expire_snapshot)
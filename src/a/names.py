@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""existence filters and negative lookups"""
+
+import secrets
+import threading
+import typing as t
+import unicodedata
+from bisect import bisect_left
+from time import monotonic
+
+import flask
+
+from . import bus, cache, models
+
+
+def fold(name: str) -> str:
+    """fold a name at least as much as the case and accent insensitive collation
+    of the username columns does, so names equal in the database fold the same"""
+
+    return "".join(
+        char
+        for char in unicodedata.normalize("NFKD", name.casefold())
+        if not unicodedata.combining(char)
+    ).casefold().rstrip(" ")
+
+
+class Names:
+    """sorted array of existing names ( folded ), so unknown names can 404 without
+    a query
+
+    the array is rebuilt when its generation in memcached changes, which is
+    checked at most every l1 timeout or when a bump is published on the bus, and
+    the filter is not trusted at all when memcached is unavailable"""
+
+    def __init__(self, kind: str, query: t.Callable[[], t.Iterable[str]]) -> None:
+        self.kind: str = kind
+        self.query: t.Callable[[], t.Iterable[str]] = query
+        self.names: t.List[str] = []
+        self.gen: t.Any = None
+        self.checked: float = 0
+        self.lock: threading.Lock = threading.Lock()
+
+        bus.hub.subscribe(f"names:{kind}", self.expire)
+
+    @property
+    def key(self) -> str:
+        """generation key"""
+        return f"gen:names:{self.kind}"
+
+    def generation(self) -> t.Any:
+        """current generation, read from l2 to see changes by other workers"""
+
+        data: t.Any = cache.store.l2(lambda mc: mc.get(self.key))
+
+        if data is None:
+            cache.store.add(self.key, secrets.token_hex(8), 0)
+            data = cache.store.l2(lambda mc: mc.get(self.key))
+
+        if data is cache.MISS or data is None:
+            return cache.MISS
+
+        return cache.store.load(data)
+
+    def rebuild(self, gen: t.Any) -> None:
+        """rebuild the array for generation `gen`"""
+
+        with self.lock:
+            if gen == self.gen:
+                return
+
+            self.names = sorted({fold(name) for name in self.query()})
+            self.gen = gen
+
+    def expire(self, _: t.Any = None) -> None:
+        """recheck the generation on the next lookup"""
+        self.checked = 0
+
+    def bump(self) -> None:
+        """mark the array as outdated in every worker"""
+
+        cache.store.set(self.key, secrets.token_hex(8), 0)
+        self.expire()
+        bus.hub.publish(f"names:{self.kind}")
+
+    def absent(self, name: str) -> bool:
+        """is `name` known to not exist, false if unsure"""
+
+        if monotonic() >= self.checked:
+            if (gen := self.generation()) is cache.MISS:
+                return False
+
+            if gen != self.gen:
+                self.rebuild(gen)
+
+            self.checked = monotonic() + cache.store.l1_timeout
+
+        name = fold(name)
+        idx: int = bisect_left(self.names, name)
+
+        return idx >= len(self.names) or self.names[idx] != name
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+users: Names = Names(
+    "users",
+    lambda: (u for (u,) in models.db.session.query(models.User.username)),  # type: ignore
+)
+blogs: Names = Names(
+    "blogs",
+    lambda: (b for (b,) in models.db.session.query(models.Blog.username)),  # type: ignore
+)
+
+
+def first_or_404(query: t.Any, key: str) -> t.Any:
+    """`query.first_or_404()` with the 404 remembered in the cache under `key`,
+    `query` may also be a function returning the object or `None`"""
+
+    if cache.store.get(f"neg:{key}") is not None:
+        flask.abort(404)
+
+    if (obj := query() if callable(query) else query.first()) is None:
+        cache.store.set(
+            f"neg:{key}",
+            True,
+            flask.current_app.config["CACHE_NEGATIVE_TIMEOUT"],
+        )
+        flask.abort(404)
+
+    return obj
+
+
+def forget(key: str) -> None:
+    """forget a remembered 404"""
+    cache.store.delete(f"neg:{key}")
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""slow request profiler
+
+a thread samples the stacks of requests which have been running for longer than
+`PROFILE_DELAY`, and requests which end up slower than `PROFILE_THRESHOLD` get
+their samples saved as collapsed stacks ( flamegraph.pl / speedscope format )"""
+
+import os
+import re
+import sys
+import threading
+import time
+import typing as t
+from collections import Counter
+from time import perf_counter
+
+import flask
+
+NAME_RE: t.Final[re.Pattern[str]] = re.compile(r"[^\w.@~-]+")
+
+
+class Request:
+    """an in-flight request"""
+
+    __slots__ = "start", "method", "path", "samples"
+
+    def __init__(self, method: str, path: str) -> None:
+        self.start: float = perf_counter()
+        self.method: str = method
+        self.path: str = path
+        self.samples: t.Counter[str] = Counter()
+
+
+def collapse(frame: t.Any) -> str:
+    """collapse a stack, root first"""
+
+    stack: t.List[str] = []
+
+    while frame is not None:
+        code: t.Any = frame.f_code
+        stack.append(f"{code.co_name} ({os.path.basename(code.co_filename)})")
+        frame = frame.f_back
+
+    return ";".join(reversed(stack))
+
+
+class Profiler:
+    """samples slow requests"""
+
+    def __init__(self) -> None:
+        self.dir: str = ""
+        self.threshold: float = 1
+        self.delay: float = 0.25
+        self.interval: float = 0.01
+        self.keep: int = 64
+        self.active: t.Dict[int, Request] = {}
+        self.pid: int = 0
+        self.lock: threading.Lock = threading.Lock()
+
+    def init_app(self, app: flask.Flask) -> None:
+        """profile the slow requests of `app`"""
+
+        app.config.setdefault("PROFILE_DIR", "")
+        app.config.setdefault("PROFILE_THRESHOLD", 1)
+        app.config.setdefault("PROFILE_DELAY", 0.25)
+        app.config.setdefault("PROFILE_INTERVAL", 0.01)
+        app.config.setdefault("PROFILE_KEEP", 64)
+
+        self.dir = app.config["PROFILE_DIR"]
+        self.threshold = app.config["PROFILE_THRESHOLD"]
+        self.delay = app.config["PROFILE_DELAY"]
+        self.interval = app.config["PROFILE_INTERVAL"]
+        self.keep = app.config["PROFILE_KEEP"]
+
+        if not self.dir:
+            return
+
+        os.makedirs(self.dir, exist_ok=True)
+
+        app.before_request(self.begin)
+        app.teardown_request(self.end)
+
+    def start(self) -> None:
+        """start the sampler in this worker if it is not running"""
+
+        if self.pid == os.getpid():
+            return
+
+        with self.lock:
+            if self.pid != os.getpid():
+                self.active = {}
+                threading.Thread(target=self.run, daemon=True).start()
+                self.pid = os.getpid()
+
+    def run(self) -> None:
+        """sample forever"""
+
+        while True:
+            time.sleep(self.interval)
+
+            if not self.active:
+                continue
+
+            now: float = perf_counter()
+            frames: t.Dict[int, t.Any] = sys._current_frames()  # type: ignore
+
+            for ident, request in tuple(self.active.items()):
+                if now - request.start >= self.delay and ident in frames:
+                    request.samples[collapse(frames[ident])] += 1
+
+            del frames
+
+    def begin(self) -> None:
+        """track the current request"""
+
+        self.start()
+        self.active[threading.get_ident()] = Request(
+            flask.request.method, flask.request.path
+        )
+
+    def end(self, _: t.Optional[BaseException]) -> None:
+        """stop tracking the current request and save it if it was slow"""
+
+        if (request := self.active.pop(threading.get_ident(), None)) is None:
+            return
+
+        duration: float = perf_counter() - request.start
+
+        if duration >= self.threshold and request.samples:
+            self.save(request, duration)
+
+    def save(self, request: Request, duration: float) -> None:
+        """save the samples of `request` and drop the oldest profiles"""
+
+        name: str = (
+            f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{int(duration * 1000)}ms-"
+            f"{request.method}{NAME_RE.sub('_', request.path)}"
+        )[:200]
+
+        with open(os.path.join(self.dir, f"{name}.folded"), "w") as fp:
+            for stack, count in request.samples.most_common():
+                fp.write(f"{stack} {count}\n")
+
+        for old in self.profiles()[self.keep:]:
+            try:
+                os.remove(os.path.join(self.dir, old))
+            except FileNotFoundError:
+                pass
+
+    def profiles(self) -> t.List[str]:
+        """saved profiles, newest first"""
+
+        if not self.dir:
+            return []
+
+        return sorted(
+            (name for name in os.listdir(self.dir) if name.endswith(".folded")),
+            reverse=True,
+        )
+
+    def read(self, name: str) -> t.Optional[str]:
+        """read a saved profile"""
+
+        if name not in self.profiles():
+            return None
+
+        with open(os.path.join(self.dir, name), "r") as fp:
+            return fp.read()
+
+
+profiler: Profiler = Profiler()
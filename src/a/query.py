@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""query timing
+
+a single pair of engine events times every statement and passes it on to the
+registered listeners, so instrumentation does not stack its own timers"""
+
+import typing as t
+from time import perf_counter
+
+import flask
+from sqlalchemy import event
+
+listeners: t.List[t.Callable[[str, float], None]] = []
+
+
+def listen(fn: t.Callable[[str, float], None]) -> t.Callable[[str, float], None]:
+    """call `fn` with the statement and its duration after every query"""
+
+    listeners.append(fn)
+    return fn
+
+
+def init_app(app: flask.Flask) -> None:
+    """time the queries of `app`, call after the database is set up"""
+
+    from .models import db
+
+    with app.app_context():
+        engine: t.Any = db.engine
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def _(conn: t.Any, *_: t.Any) -> None:
+        conn.info.setdefault("query_start", []).append(perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _(conn: t.Any, _: t.Any, statement: str, *__: t.Any) -> None:
+        seconds: float = perf_counter() - conn.info["query_start"].pop()
+
+        for fn in listeners:
+            fn(statement, seconds)
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""schema migration and index checks
+
+`db.create_all` only creates missing tables, so indexes added to the models are
+created on existing databases here, and the query plans of the hot queries are
+checked to use them ( on real data, the optimizer may scan a near-empty table )
+
+    python3 -m a.schema [migrate] [check]"""
+
+import atexit
+import os
+import re
+import sys
+import typing as t
+from datetime import datetime
+
+import flask
+import sqlalchemy
+from sqlalchemy import func, select
+
+from . import cache, const, create_app, models
+
+SQLITE_INDEX_RE: t.Final[re.Pattern[str]] = re.compile(
+    r"USING (?:COVERING )?INDEX (\S+)|USING (INTEGER PRIMARY KEY)"
+)
+
+
+def hot() -> t.Dict[str, t.Tuple[t.Any, t.Tuple[str, ...]]]:
+    """hot queries and the indexes they may use"""
+
+    post: t.Any = models.BlogPost
+    counter: t.Any = models.Counter
+    app: t.Any = models.App
+
+    # slugs are unique globally, so either index finds a post by slug
+
+    return {
+        "post by username and slug": (
+            select(post).filter_by(username="user", slug="slug"),
+            ("ix_blog_post_username_slug", "ix_blog_post_slug"),
+        ),
+        "posts of a blog, newest first": (
+            select(post).filter_by(username="user").order_by(post.posted.desc()),
+            ("ix_blog_post_username_posted",),
+        ),
+        "page of a blog after a cursor": (
+            models.PostSummary.statement(
+                "user", const.BLOG_PAGE_POSTS, (datetime(2000, 1, 1), "id")
+            ),
+            ("ix_blog_post_username_posted",),
+        ),
+        "post by slug": (
+            select(post).filter_by(slug="slug"),
+            ("ix_blog_post_slug",),
+        ),
+        "counter by username and id": (
+            select(counter).filter_by(username="user", id="id"),
+            ("PRIMARY", "ix_counter_username_id"),
+        ),
+        "counters of a user": (
+            select(counter).filter_by(username="user"),
+            ("ix_counter_username_id",),
+        ),
+        "app by username and id": (
+            select(app).filter_by(username="user", id="id"),
+            ("PRIMARY", "ix_app_username_id"),
+        ),
+        "apps of a user": (
+            select(app).filter_by(username="user"),
+            ("ix_app_username_id",),
+        ),
+    }
+
+
+def indexes_used(conn: t.Any, statement: t.Any) -> t.Set[str]:
+    """names of the indexes in the query plan of `statement`, primary keys are
+    reported as `PRIMARY`"""
+
+    sql: str = str(
+        statement.compile(dialect=conn.dialect, compile_kwargs={"literal_binds": True})
+    )
+
+    if conn.dialect.name == "sqlite":
+        used: t.Set[str] = set()
+
+        for row in conn.exec_driver_sql(f"EXPLAIN QUERY PLAN {sql}"):
+            for match in SQLITE_INDEX_RE.finditer(row.detail):
+                name: str = match.group(1) or "PRIMARY"
+                used.add("PRIMARY" if name.startswith("sqlite_autoindex_") else name)
+
+        return used
+
+    return {
+        row._mapping["key"]
+        for row in conn.exec_driver_sql(f"EXPLAIN {sql}")
+        if row._mapping["key"]
+    }
+
+
+def migrate(engine: t.Any) -> t.List[str]:
+    """create the missing indexes of the models and drop the single column
+    foreign key indexes mariadb made, which the composite ones now cover"""
+
+    changes: t.List[str] = []
+    inspector: t.Any = sqlalchemy.inspect(engine)
+
+    for table in models.db.metadata.sorted_tables:
+        existing: t.Dict[str, t.Any] = {
+            index["name"]: index for index in inspector.get_indexes(table.name)
+        }
+
+        with engine.begin() as conn:
+            for index in table.indexes:
+                if index.name in existing:
+                    continue
+
+                columns: t.List[t.Any] = list(index.columns)
+
+                if index.unique and conn.execute(
+                    select(*columns, func.count())
+                    .group_by(*columns)
+                    .having(func.count() > 1)
+                    .limit(1)
+                ).first():
+                    raise RuntimeError(
+                        f"{table.name} has duplicate {', '.join(c.name for c in columns)}, "
+                        f"cannot create {index.name}"
+                    )
+
+                index.create(conn)
+                changes.append(f"created {index.name}")
+
+            if conn.dialect.name != "mysql":
+                continue
+
+            for name, index in existing.items():
+                if index["unique"] or len(index["column_names"]) != 1:
+                    continue
+
+                if any(
+                    other.name != name
+                    and list(other.columns)[0].name == index["column_names"][0]
+                    for other in table.indexes
+                ):
+                    conn.exec_driver_sql(f"ALTER TABLE `{table.name}` DROP INDEX `{name}`")
+                    changes.append(f"dropped {table.name}.{name}")
+
+    return changes
+
+
+def check(engine: t.Any) -> t.List[str]:
+    """hot queries not using one of their indexes"""
+
+    failures: t.List[str] = []
+
+    with engine.connect() as conn:
+        for name, (statement, expected) in hot().items():
+            used: t.Set[str] = indexes_used(conn, statement)
+
+            if not used.intersection(expected):
+                failures.append(
+                    f"{name} : uses {', '.join(sorted(used)) or 'no index'}, "
+                    f"expected {' or '.join(expected)}"
+                )
+
+    return failures
+
+
+def main() -> int:
+    """entry/main function"""
+
+    if (maria_user := os.environ.get("MARIA_USER")) is None or (
+        maria_pass := os.environ.get("MARIA_PASS")
+    ) is None:
+        print("no MARIA_USER or MARIA_PASS defined", file=sys.stderr)
+        return 1
+
+    commands: t.List[str] = sys.argv[1:] or ["migrate", "check"]
+
+    app: flask.Flask = create_app(maria_user, maria_pass, {"RATELIMIT_ENABLED": False})
+    atexit.unregister(cache.store.save)
+
+    with app.app_context():
+        engine: t.Any = models.db.engine
+
+        if "migrate" in commands:
+            for change in migrate(engine):
+                print(f"schema : {change}")
+
+        if "check" in commands:
+            failures: t.List[str] = check(engine)
+
+            for failure in failures:
+                print(f"schema : {failure}", file=sys.stderr)
+
+            if failures:
+                return 1
+
+            print(f"schema : {len(hot())} hot queries use their indexes")
+
+    return 0
+
+
+if __name__ == "__main__":
+    assert main.__annotations__.get("return") is int, "main() should return an integer"
+    raise SystemExit(main())
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""sql profiler
+
+opt-in through `SQLPROF_ENABLED` : statements are counted and timed per request
+and grouped by fingerprint, a fingerprint running many times in one request is
+most likely an n+1 pattern, requests over the thresholds are logged with their
+worst statements"""
+
+import re
+import typing as t
+
+import flask
+
+from . import query
+
+# literals are stripped so statements only differing in values share a fingerprint
+
+LITERAL_RE: t.Final[re.Pattern[str]] = re.compile(
+    r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b|%\(\w+\)s|%s|:\w+|\?"
+)
+LIST_RE: t.Final[re.Pattern[str]] = re.compile(r"\((?:\s*\?\s*,)+\s*\?\s*\)")
+SPACE_RE: t.Final[re.Pattern[str]] = re.compile(r"\s+")
+
+
+def fingerprint(statement: str) -> str:
+    """normalize a statement"""
+
+    statement = LITERAL_RE.sub("?", statement)
+    statement = LIST_RE.sub("(?+)", statement)
+    return SPACE_RE.sub(" ", statement).strip()
+
+
+class Profile:
+    """statements of one request"""
+
+    __slots__ = "count", "seconds", "statements"
+
+    def __init__(self) -> None:
+        self.count: int = 0
+        self.seconds: float = 0
+        self.statements: t.Dict[str, t.List[float]] = {}
+
+    def add(self, statement: str, seconds: float) -> None:
+        """record a statement"""
+
+        self.count += 1
+        self.seconds += seconds
+
+        entry: t.List[float] = self.statements.setdefault(fingerprint(statement), [0, 0])
+        entry[0] += 1
+        entry[1] += seconds
+
+    def repeated(self, threshold: int) -> t.List[t.Tuple[str, t.List[float]]]:
+        """fingerprints which ran at least `threshold` times, most frequent first"""
+
+        return sorted(
+            ((fp, entry) for fp, entry in self.statements.items() if entry[0] >= threshold),
+            key=lambda item: item[1][0],
+            reverse=True,
+        )
+
+    def worst(self, n: int) -> t.List[t.Tuple[str, t.List[float]]]:
+        """`n` fingerprints which took the longest in total"""
+
+        return sorted(
+            self.statements.items(),
+            key=lambda item: item[1][1],
+            reverse=True,
+        )[:n]
+
+
+def init_app(app: flask.Flask) -> None:
+    """profile the sql of `app` if enabled"""
+
+    app.config.setdefault("SQLPROF_ENABLED", False)
+    app.config.setdefault("SQLPROF_REPEAT", 5)
+    app.config.setdefault("SQLPROF_SLOW_QUERIES", 20)
+    app.config.setdefault("SQLPROF_SLOW_SECONDS", 0.1)
+    app.config.setdefault("SQLPROF_WORST", 3)
+
+    if not app.config["SQLPROF_ENABLED"]:
+        return
+
+    @query.listen
+    def _(statement: str, seconds: float) -> None:
+        if flask.has_request_context():  # type: ignore
+            if (profile := flask.g.get("sqlprof")) is None:
+                profile = flask.g.sqlprof = Profile()
+
+            profile.add(statement, seconds)
+
+    @app.after_request
+    def _(response: flask.Response) -> flask.Response:
+        """report the profile"""
+
+        if (profile := flask.g.get("sqlprof")) is None:
+            return response
+
+        repeated: t.List[t.Tuple[str, t.List[float]]] = profile.repeated(
+            app.config["SQLPROF_REPEAT"]
+        )
+
+        if app.debug:
+            response.headers["X-SQL-Profile"] = (
+                f"queries={profile.count}; time={profile.seconds * 1000:.2f}ms; "
+                f"statements={len(profile.statements)}; repeated={len(repeated)}"
+            )
+
+        if (
+            repeated
+            or profile.count >= app.config["SQLPROF_SLOW_QUERIES"]
+            or profile.seconds >= app.config["SQLPROF_SLOW_SECONDS"]
+        ):
+            app.logger.warning(
+                "sql : %s %s : %d queries in %.2fms%s%s",
+                flask.request.method,
+                flask.request.path,
+                profile.count,
+                profile.seconds * 1000,
+                "".join(
+                    f"\n  repeated {int(n)}x ( {s * 1000:.2f}ms ) : {fp}"
+                    for fp, (n, s) in repeated
+                ),
+                "".join(
+                    f"\n  {int(n)}x ( {s * 1000:.2f}ms ) : {fp}"
+                    for fp, (n, s) in profile.worst(app.config["SQLPROF_WORST"])
+                ),
+            )
+
+        return response
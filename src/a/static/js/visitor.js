@@ -0,0 +1,18 @@
+"use strict";
+
+function main() {
+    let owner = document.getElementById("owner");
+    let messages = document.getElementById("messages");
+
+    if (!owner) return;
+
+    fetch(owner.dataset.src, { credentials: "same-origin" })
+        .then((r) => (r.status === 200 ? r.json() : {}))
+        .then((parts) => {
+            if (parts.owner) owner.outerHTML = parts.owner;
+            if (parts.messages && messages) messages.outerHTML = parts.messages;
+        })
+        .catch((e) => console.error(e));
+}
+
+document.addEventListener("DOMContentLoaded", main);
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""streaming responses"""
+
+import re
+import typing as t
+
+import flask
+import web_mini
+
+from . import cache, metrics, trace
+
+# tokens which change whether it is safe to cut the html, and cut candidates : a
+# `>` followed by whitespace and a `<`, which the minifier collapses anyway
+
+TOKEN_RE: t.Final[re.Pattern[str]] = re.compile(
+    r"<!--|-->|<(/?)(?:pre|code|textarea|script|style)\b|>(?=\s+<)",
+    re.I,
+)
+
+
+class MiniStream:
+    """incremental html minifier
+
+    buffers chunks until `size` characters are available and then minifies and
+    emits everything up to the last tag boundary outside of whitespace-sensitive
+    tags and comments, so the output matches minifying the whole document"""
+
+    def __init__(self, size: int) -> None:
+        self.size: int = size
+        self.buf: t.List[str] = []
+        self.buf_len: int = 0
+        self.raw: int = 0
+        self.comment: bool = False
+        self.space: bool = False
+
+    def _cut(self, data: str) -> int:
+        """find the last safe cut offset in `data`, returns -1 if there is none"""
+
+        raw: int = self.raw
+        comment: bool = self.comment
+
+        cut: int = -1
+        cut_state: t.Tuple[int, bool] = (raw, comment)
+
+        for m in TOKEN_RE.finditer(data):
+            tok: str = m.group()
+
+            if tok == "<!--":
+                comment = True
+            elif tok == "-->":
+                comment = False
+            elif comment:
+                continue
+            elif tok == ">":
+                if raw == 0:
+                    cut = m.end()
+                    cut_state = (raw, comment)
+            elif m.group(1):
+                raw = max(raw - 1, 0)
+            else:
+                raw += 1
+
+        if cut != -1:
+            self.raw, self.comment = cut_state
+
+        return cut
+
+    def _emit(self, data: str, final: bool = False) -> t.Optional[str]:
+        """minify and emit as much of `data` as possible"""
+
+        cut: int = len(data) if final else self._cut(data)
+
+        if cut == -1:
+            self.buf, self.buf_len = [data], len(data)
+            return None
+
+        with metrics.minify.time(), trace.span("minify"):
+            chunk: str = web_mini.html.minify_html(data[:cut])
+        rest: str = data[cut:]
+
+        # whitespace at a cut is collapsed into one space in front of the next
+        # non-empty chunk, chunks can minify to nothing ( eg `<tbody>` )
+
+        if chunk and self.space:
+            chunk = f" {chunk}"
+
+        self.space = (self.space and not chunk) or rest[:1].isspace()
+        rest = rest.lstrip()
+
+        self.buf, self.buf_len = ([rest] if rest else []), len(rest)
+
+        return chunk or None
+
+    def feed(self, data: str) -> t.Optional[str]:
+        """feed a chunk, returns minified html if a chunk is ready"""
+
+        self.buf.append(data)
+        self.buf_len += len(data)
+
+        if self.buf_len < self.size:
+            return None
+
+        return self._emit("".join(self.buf))
+
+    def close(self) -> t.Optional[str]:
+        """flush the rest of the buffer"""
+        return self._emit("".join(self.buf), True)
+
+
+def minify(chunks: t.Iterable[str], size: int) -> t.Iterator[str]:
+    """minify a stream of html chunks"""
+
+    mini: MiniStream = MiniStream(size)
+    out: t.Optional[str]
+
+    for chunk in chunks:
+        if (out := mini.feed(chunk)) is not None:
+            yield out
+
+    if (out := mini.close()) is not None:
+        yield out
+
+
+def html(body: str) -> flask.Response:
+    """respond with already minified html"""
+
+    flask.g.minified = True
+    return flask.Response(body, mimetype="text/html")
+
+
+def page(
+    key: str,
+    render: t.Callable[[], t.Union[str, t.Iterator[str]]],
+) -> flask.Response:
+    """serve a cached page, `render` returns the rendered template or a
+    template stream, pages are coalesced so only one request renders a page
+    while others get the stale version or wait for it"""
+
+    body: t.Any
+    fresh: bool
+
+    body, fresh = cache.store.peek(key)
+
+    if fresh:
+        cache.mark("hit")
+        return html(body)
+
+    # a head request never reads the body, so it does not lead a render
+
+    head: bool = flask.request.method == "HEAD"
+    leader: bool = not head and cache.store.acquire(key)
+
+    if not leader:
+        if body is not cache.MISS:
+            cache.mark("stale")
+            return html(body)
+
+        if not head and (body := cache.store.wait(key)) is not cache.MISS:
+            cache.mark("wait")
+            return html(body)
+
+    cache.mark("miss")
+
+    try:
+        rendered: t.Union[str, t.Iterator[str]] = render()
+    except BaseException:
+        if leader:
+            cache.store.release(key)
+
+        raise
+
+    if isinstance(rendered, str):
+        try:
+            with metrics.minify.time(), trace.span("minify"):
+                body = web_mini.html.minify_html(rendered)
+            cache.store.put(key, body)
+        finally:
+            if leader:
+                cache.store.release(key)
+
+        return html(body)
+
+    def tee(chunks: t.Iterator[str], size: int) -> t.Iterator[str]:
+        """stream the page and cache it once it is complete"""
+
+        parts: t.List[str] = []
+
+        for chunk in minify(chunks, size):
+            parts.append(chunk)
+            yield chunk
+
+        cache.store.put(key, "".join(parts))
+
+    response: flask.Response = flask.Response(
+        tee(rendered, flask.current_app.config["STREAM_CHUNK_SIZE"]),
+        mimetype="text/html",
+    )
+
+    # the server closes the response even if the body was never started ( head
+    # requests, disconnected clients ), a generator `finally` would not run then
+
+    if leader:
+        response.call_on_close(lambda: cache.store.release(key))
+
+    return response
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""system information sampler
+
+samples /proc, statvfs and the database table sizes into a snapshot shared
+through the cache, one worker at a time refreshes it once it is older than the
+interval while the others keep serving the stale one, so the index page renders
+without forking anything"""
+
+import os
+import time
+import typing as t
+
+import flask
+from sqlalchemy import text
+
+from . import cache, models, util
+
+UNITS: t.Final[t.Tuple[str, ...]] = ("b", "kb", "mb", "gb", "tb", "pb")
+
+
+def size(n: float) -> str:
+    """human readable size"""
+
+    for unit in UNITS[:-1]:
+        if abs(n) < 1024:
+            return f"{n:.1f} {unit}"
+
+        n /= 1024
+
+    return f"{n:.1f} {UNITS[-1]}"
+
+
+def memory() -> str:
+    """memory and swap usage from /proc/meminfo"""
+
+    info: t.Dict[str, int] = {}
+
+    with open("/proc/meminfo", "r") as fp:
+        for line in fp:
+            key, _, value = line.partition(":")
+            info[key] = int(value.split()[0]) * 1024
+
+    total: int = info.get("MemTotal", 0)
+    available: int = info.get("MemAvailable", info.get("MemFree", 0))
+    swap: int = info.get("SwapTotal", 0)
+    swap_free: int = info.get("SwapFree", 0)
+
+    return f"""mem  : total {size(total)}, used {size(total - available)}, \
+free {size(info.get("MemFree", 0))}, available {size(available)}
+swap : total {size(swap)}, used {size(swap - swap_free)}, free {size(swap_free)}"""
+
+
+def disks() -> str:
+    """block device usage through statvfs"""
+
+    lines: t.List[str] = []
+    seen: t.Set[str] = set()
+
+    with open("/proc/mounts", "r") as fp:
+        for line in fp:
+            dev, path, fstype = line.split()[:3]
+
+            if not dev.startswith("/dev/") or dev in seen:
+                continue
+
+            seen.add(dev)
+
+            try:
+                st: os.statvfs_result = os.statvfs(path.replace("\\040", " "))
+            except OSError:
+                continue
+
+            total: int = st.f_blocks * st.f_frsize
+            avail: int = st.f_bavail * st.f_frsize
+            used: int = total - st.f_bfree * st.f_frsize
+
+            lines.append(
+                f"{dev} {fstype} {path} : avail {size(avail)}, "
+                f"use {used / total * 100 if total else 0:.0f}%"
+            )
+
+    return "\n".join(lines)
+
+
+def database() -> str:
+    """table sizes from information_schema"""
+
+    rows: t.List[t.Any] = list(
+        models.db.session.execute(
+            text(
+                "SELECT table_name, data_length + index_length FROM information_schema.tables "
+                "WHERE table_schema = DATABASE() ORDER BY 2 DESC"
+            )
+        )
+    )
+
+    return "\n".join(
+        [f"{name} : {size(n or 0)}" for name, n in rows]
+        + [f"total : {size(sum(n or 0 for _, n in rows))}"]
+    )
+
+
+class Sampler:
+    """samples system information on demand"""
+
+    def __init__(self) -> None:
+        self.app: t.Optional[flask.Flask] = None
+        self.interval: int = 10
+
+    def init_app(self, app: flask.Flask) -> None:
+        """configure the sampler from `app`"""
+
+        app.config.setdefault("SYSINFO_INTERVAL", 10)
+
+        self.app = app
+        self.interval = app.config["SYSINFO_INTERVAL"]
+
+    def sample(self) -> t.Dict[str, str]:
+        """take a new snapshot"""
+
+        snapshot: t.Dict[str, str] = {}
+
+        for name, fn in (("mem", memory), ("disk", disks)):
+            try:
+                snapshot[name] = fn()
+            except OSError:
+                snapshot[name] = "unavailable"
+
+        try:
+            with self.app.app_context():  # type: ignore
+                snapshot["db"] = database()
+        except Exception:
+            snapshot["db"] = "unavailable"
+
+        with open("/proc/loadavg", "r") as fp:
+            snapshot["loadavg"] = fp.read().strip()
+
+        rx, tx, oc = util.get_network()
+        cpu: int = os.cpu_count() or 1
+
+        snapshot["cpu"] = (
+            f"{float(snapshot['loadavg'].split(maxsplit=1)[0]) / cpu * 100:.3f}% "
+            f"| {cpu} threads"
+        )
+        snapshot["net"] = (
+            f"rx {rx / 1024 / 1024:.3f} mb, tx {tx / 1024 / 1024:.3f} mb, open {oc}"
+        )
+        snapshot["date"] = time.strftime("%a %b %e %H:%M:%S %Z %Y")
+
+        return snapshot
+
+    def get(self) -> t.Dict[str, str]:
+        """get the latest snapshot, sampling a new one if it is older than the
+        interval and no other worker is already doing so"""
+        return cache.store.coalesce("sysinfo", self.sample, self.interval)
+
+
+sampler: Sampler = Sampler()
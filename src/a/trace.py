@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""request tracing
+
+spans are collected per request in a context variable and reported in the
+`Server-Timing` header in debug mode ( it shows query counts and timings ), and
+appended to `TRACE_FILE` as json lines by a writer thread if it is set"""
+
+import time
+import typing as t
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+
+import flask
+
+from . import accesslog, query
+
+# ( name, start offset, duration ) in seconds
+
+Span = t.Tuple[str, float, float]
+
+spans: ContextVar[t.Optional[t.List[Span]]] = ContextVar("spans", default=None)
+origin: ContextVar[float] = ContextVar("origin", default=0)
+
+log: accesslog.AccessLog = accesslog.AccessLog()
+
+
+def add(name: str, start: float, duration: float) -> None:
+    """record a span which started at `start` ( a `perf_counter` value )"""
+
+    if (trace := spans.get()) is not None:
+        trace.append((name, start - origin.get(), duration))
+
+
+@contextmanager
+def span(name: str) -> t.Generator[None, None, None]:
+    """trace a block"""
+
+    if spans.get() is None:
+        yield
+        return
+
+    start: float = perf_counter()
+
+    try:
+        yield
+    finally:
+        add(name, start, perf_counter() - start)
+
+
+def traced(name: str) -> t.Callable[[t.Callable[..., t.Any]], t.Callable[..., t.Any]]:
+    """trace a function"""
+
+    def decorate(fn: t.Callable[..., t.Any]) -> t.Callable[..., t.Any]:
+        """decorate traced"""
+
+        @wraps(fn)
+        def wrapper(*args: t.Any, **kwargs: t.Any) -> t.Any:
+            """function wrapper"""
+
+            with span(name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorate
+
+
+def summary(trace: t.List[Span]) -> t.Dict[str, t.Tuple[int, float]]:
+    """count and total duration of spans by name"""
+
+    total: t.Dict[str, t.Tuple[int, float]] = {}
+
+    for name, _, duration in trace:
+        count, seconds = total.get(name, (0, 0))
+        total[name] = (count + 1, seconds + duration)
+
+    return total
+
+
+def init_app(app: flask.Flask) -> None:
+    """trace the requests of `app`, call before other request hooks are
+    registered so the response hooks of the app are traced too"""
+
+    app.config.setdefault("TRACE_ENABLED", False)
+    app.config.setdefault("TRACE_FILE", "")
+
+    if not app.config["TRACE_ENABLED"]:
+        return
+
+    log.setup(app.config["TRACE_FILE"])
+
+    @app.before_request
+    def _() -> None:
+        """start tracing"""
+
+        spans.set([])
+        origin.set(perf_counter())
+
+    @app.after_request
+    def _(response: flask.Response) -> flask.Response:
+        """report the trace"""
+
+        if (trace := spans.get()) is None:
+            return response
+
+        spans.set(None)
+        total: float = perf_counter() - origin.get()
+
+        if app.debug:
+            response.headers["Server-Timing"] = ", ".join(
+                [
+                    f'{name};desc="{count}x";dur={seconds * 1000:.2f}'
+                    for name, (count, seconds) in summary(trace).items()
+                ]
+                + [f"total;dur={total * 1000:.2f}"]
+            )
+
+        if log.path:
+            log.log(
+                {
+                    "time": time.time(),
+                    "method": flask.request.method,
+                    "path": flask.request.path,
+                    "endpoint": flask.request.endpoint,
+                    "status": response.status_code,
+                    "total": total,
+                    "spans": trace,
+                }
+            )
+
+        return response
+
+    @flask.before_render_template.connect_via(app)
+    def _(*_: t.Any, **__: t.Any) -> None:
+        """start timing a template"""
+
+        if spans.get() is not None:
+            flask.g.setdefault("trace_render", []).append(perf_counter())
+
+    @flask.template_rendered.connect_via(app)
+    def _(*_: t.Any, **__: t.Any) -> None:
+        """stop timing a template"""
+
+        if spans.get() is not None and (starts := flask.g.get("trace_render")):
+            start: float = starts.pop()
+            add("render", start, perf_counter() - start)
+
+    @query.listen
+    def _(_: str, seconds: float) -> None:
+        add("db", perf_counter() - seconds, seconds)
@@ -3,7 +3,6 @@
 """utils"""
 
 from functools import wraps
-from subprocess import check_output
 from typing import Any, Callable, NoReturn, Optional, Tuple
 
 import flask
@@ -100,7 +99,11 @@ def captcha(fn: Callable[..., Any]) -> Callable[..., Any]:
         # TODO better handling of invalid captcha, rn it just returns 302 which returns 200
         # which sucks and does not properly indicate error
 
-        if not flask.current_app.debug and not c.verify(flask.request.form.get("code")):
+        if (
+            flask.current_app.config["CAPTCHA_ENABLED"]
+            and not flask.current_app.debug
+            and not c.verify(flask.request.form.get("code"))
+        ):
             flask.flash("invalid CAPTCHA", "error")
             return flask.redirect(flask.request.url)
 
@@ -124,6 +127,42 @@ def make_api(response: flask.Response, cors: bool = True) -> flask.Response:
     return response
 
 
+def origin() -> str:
+    """the configured origin of the site, cached pages and feeds use it instead of
+    the host header, which the client controls"""
+
+    config: Any = flask.current_app.config
+    return f"{config['PREFERRED_URL_SCHEME']}://{config['DOMAIN']}"
+
+
+def make_public(response: flask.Response) -> flask.Response:
+    """make a response cacheable by shared caches ( same for every user ), unless
+    it sets a cookie"""
+
+    app: flask.Flask = flask.current_app  # type: ignore
+
+    # a shared cache would hand the cookie to everyone, the session is written
+    # when it was modified ( eg the user snapshot ) or is refreshed every request
+
+    if (
+        "Set-Cookie" in response.headers
+        or flask.session.modified
+        or app.session_interface.should_set_cookie(app, flask.session)  # type: ignore
+    ):
+        return response
+
+    # flask-login loads the user for every template, which marks the session as
+    # accessed and adds `Vary: Cookie`, public pages do not depend on the session
+
+    flask.session.accessed = False
+
+    response.headers[
+        "Cache-Control"
+    ] = f"public, max-age=0, s-maxage={flask.current_app.config['PUBLIC_CACHE_MAX_AGE']}"
+
+    return response
+
+
 def api(fn: Callable[..., Any]) -> Callable[..., Any]:
     """api endpoint"""
 
@@ -225,15 +264,42 @@ def trunc(data: str, length: int, end: str = " ...") -> str:
 
 
 def get_network() -> Tuple[int, int, int]:
-    """get network usage in bytes
+    """get network usage in bytes and open tcp / udp connections, read from /proc
 
     rx, tx, oc"""
 
-    oc: int = max(len(check_output(["ss", "-Hntu"]).splitlines()) - 1, 0)
+    rx: int = 0
+    tx: int = 0
+    oc: int = 0
+
+    with open("/proc/net/dev", "r") as fp:
+        for line in fp:
+            iface, sep, data = line.partition(":")
+
+            if sep and iface.strip() != "lo":
+                fields = data.split()
+                rx += int(fields[0])
+                tx += int(fields[8])
+
+    # same as `ss -Hntu` : tcp sockets which are not listening and connected udp
+    # sockets, the state is the fourth column ( 0A = listen, 01 = established )
+
+    for proto, states in (
+        ("tcp", None),
+        ("tcp6", None),
+        ("udp", ("01",)),
+        ("udp6", ("01",)),
+    ):
+        try:
+            with open(f"/proc/net/{proto}", "r") as fp:
+                next(fp, None)
+
+                for line in fp:
+                    state = line.split(maxsplit=4)[3]
 
-    for line in open("/proc/net/dev", "r"):
-        if "lo" not in line and ":" in line:
-            data = line.split()
-            return int(data[1]), int(data[9]), oc
+                    if (state != "0A") if states is None else (state in states):
+                        oc += 1
+        except OSError:
+            pass
 
-    return 0, 0
+    return rx, tx, oc
@@ -2,14 +2,12 @@
 # -*- coding: utf-8 -*-
 """views"""
 
-import os
-import subprocess
 import typing as t
 
 import flask
 from werkzeug.wrappers import Response
 
-from . import models, util
+from . import models, names, sysinfo
 from .routing import Bp
 
 views: Bp = Bp("views", __name__)
@@ -19,26 +17,10 @@ views: Bp = Bp("views", __name__)
 def index() -> str:
     """index"""
 
-    with open("/proc/loadavg", "r") as fp:
-        loadavg: str = fp.read().strip()
-
-    rx, tx, oc = util.get_network()
-    cpu: int = os.cpu_count() or 1
-
     return flask.render_template(
         "index.j2",
         users=models.User.query.all(),
-        free=subprocess.check_output(("/usr/bin/free", "-h")).decode().strip(),
-        lsblk=subprocess.check_output(
-            ("/usr/bin/lsblk", "-ifo", "NAME,FSTYPE,FSVER,FSAVAIL,FSUSE%")
-        )
-        .decode()
-        .strip(),
-        db=subprocess.check_output(("/usr/bin/dbsize",)).decode().strip(),
-        loadavg=loadavg,
-        cpu=f"{float(loadavg.split(maxsplit=1)[0]) / cpu * 100:.3f}% | {cpu} threads",
-        net=f"rx {rx / 1024 / 1024:.3f} mb, tx {tx / 1024 / 1024:.3f} mb, open {oc}",
-        date=subprocess.check_output(("/usr/bin/date",)).decode().strip(),
+        sys=sysinfo.sampler.get(),
     )
 
 
@@ -53,7 +35,10 @@ def tos() -> str:
 def user(username: str) -> t.Union[str, t.Tuple[str, int]]:
     """index"""
 
-    user: t.Optional[models.User] = models.db.session.get(models.User, username)
+    if names.users.absent(username):
+        flask.abort(404)
+
+    user: t.Optional[models.User] = models.User.get_by_user(username, blog=True)
 
     if user is None:
         flask.abort(404)
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""cache warm-up
+
+run once after memcached starts and before the workers do : restores the l1
+snapshots the previous workers left behind and pre-renders the largest blogs,
+their feeds and the latest posts, so a restart does not hit mariadb all at once"""
+
+import atexit
+import os
+import sys
+import time
+import typing as t
+
+import flask
+from sqlalchemy import func
+
+from . import cache, const, create_app, models
+
+
+def targets() -> t.List[str]:
+    """paths to warm, needs an app context"""
+
+    paths: t.List[str] = ["/robots.txt", "/sitemap.xml"]
+
+    # the columns are annotated as their python types, not as columns
+
+    post: t.Any = models.BlogPost
+
+    blogs: t.List[str] = [
+        username
+        for (username,) in models.db.session.query(post.username)
+        .group_by(post.username)
+        .order_by(func.count(post.id).desc())
+        .limit(const.WARM_BLOGS)
+    ]
+
+    for user in blogs:
+        paths.extend(
+            (
+                flask.url_for("blog.user_blog", user=user),
+                flask.url_for("blog.sitemap", user=user),
+                flask.url_for("blog.rss", user=user),
+            )
+        )
+
+    for user, slug in (
+        models.db.session.query(post.username, post.slug)
+        .order_by(post.posted.desc())
+        .limit(const.WARM_POSTS)
+    ):
+        paths.append(flask.url_for("blog.show_post", user=user, slug=slug))
+
+    return paths
+
+
+def warm(app: flask.Flask) -> t.Dict[str, int]:
+    """restore snapshots and render the warm-up targets, returns counts"""
+
+    stats: t.Dict[str, int] = {"restored": 0, "rendered": 0, "failed": 0}
+
+    # only one process warms at a time, the lease expires on its own
+
+    if not cache.store.add("lease:warm", os.getpid(), 120):
+        return stats
+
+    base_url: str = f"{app.config['PREFERRED_URL_SCHEME']}://{app.config['DOMAIN']}"
+
+    with app.test_request_context(base_url=base_url):
+        stats["restored"] = cache.store.restore()
+        paths: t.List[str] = targets()
+
+    client: t.Any = app.test_client()
+
+    # bodies have to be consumed, streamed pages are only cached once complete
+
+    for path in paths:
+        with client.get(path, base_url=base_url) as response:
+            response.get_data()
+            stats["rendered" if response.status_code == 200 else "failed"] += 1
+
+    return stats
+
+
+def main() -> int:
+    """entry/main function"""
+
+    if (maria_user := os.environ.get("MARIA_USER")) is None or (
+        maria_pass := os.environ.get("MARIA_PASS")
+    ) is None:
+        print("no MARIA_USER or MARIA_PASS defined", file=sys.stderr)
+        return 1
+
+    start: float = time.monotonic()
+
+    app: flask.Flask = create_app(maria_user, maria_pass, {"RATELIMIT_ENABLED": False})
+
+    # the warm-up's own l1 would only be restored on the next restart, by which
+    # point it is outdated
+
+    atexit.unregister(cache.store.save)
+
+    stats: t.Dict[str, int] = warm(app)
+
+    print(
+        f"warm : restored {stats['restored']}, rendered {stats['rendered']}, "
+        f"failed {stats['failed']} in {time.monotonic() - start:.2f}s"
+    )
+
+    return 0
+
+
+if __name__ == "__main__":
+    assert main.__annotations__.get("return") is int, "main() should return an integer"
+    raise SystemExit(main())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""memory watchdog
+
+a thread in every worker samples its rss, and a worker over `WATCHDOG_SOFT_LIMIT`
+sends itself SIGTERM, which gunicorn handles by finishing the request in flight
+and replacing the worker, outside of gunicorn it is only logged"""
+
+import os
+import signal
+import threading
+import time
+import typing as t
+
+import flask
+
+from . import memory, metrics
+
+
+class Watchdog:
+    """recycles workers using too much memory"""
+
+    def __init__(self) -> None:
+        self.app: t.Optional[flask.Flask] = None
+        self.interval: float = 10
+        self.limit: int = 0
+        self.recycle: bool = False
+        self.pid: int = 0
+        self.lock: threading.Lock = threading.Lock()
+
+    def init_app(self, app: flask.Flask) -> None:
+        """watch the workers of `app`"""
+
+        app.config.setdefault("WATCHDOG_INTERVAL", 10)
+        app.config.setdefault("WATCHDOG_SOFT_LIMIT", 0)
+
+        self.app = app
+        self.interval = app.config["WATCHDOG_INTERVAL"]
+        self.limit = app.config["WATCHDOG_SOFT_LIMIT"]
+
+        if self.limit > 0:
+            app.before_request(self.start)
+
+    def start(self) -> None:
+        """start watching this worker if it is not watched yet"""
+
+        if self.pid == os.getpid():
+            return
+
+        with self.lock:
+            if self.pid == os.getpid():
+                return
+
+            self.recycle = flask.request.environ.get("SERVER_SOFTWARE", "").startswith(
+                "gunicorn"
+            )
+            threading.Thread(target=self.run, daemon=True).start()
+            self.pid = os.getpid()
+
+    def run(self) -> None:
+        """watch forever, or until the worker is recycled"""
+
+        over: bool = False
+
+        while True:
+            time.sleep(self.interval)
+
+            rss: int = memory.rss()
+            metrics.worker_rss.set(rss)
+
+            if rss < self.limit:
+                over = False
+                continue
+
+            # outside of gunicorn this is only logged when the limit is crossed
+
+            if over:
+                continue
+
+            over = True
+
+            self.app.logger.warning(  # type: ignore
+                "watchdog : worker %d rss %d mb over the soft limit of %d mb, %s",
+                os.getpid(),
+                rss // 2**20,
+                self.limit // 2**20,
+                "recycling" if self.recycle else "not running under gunicorn",
+            )
+
+            if self.recycle:
+                metrics.worker_recycles.inc()
+                os.kill(os.getpid(), signal.SIGTERM)
+                return
+
+
+watchdog: Watchdog = Watchdog()
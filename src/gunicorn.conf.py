@@ -0,0 +1,15 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""gunicorn configuration"""
+
+import os
+import typing as t
+
+
+def child_exit(_: t.Any, worker: t.Any) -> None:
+    """drop live gauges of dead workers"""
+
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)  # type: ignore
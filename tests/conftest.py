@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""test fixtures : the local app ( sqlite, no memcached, no rate limiting ) in a
+fresh directory for every test"""
+
+import os
+import sys
+import typing as t
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "scripts"))
+
+import local  # noqa: E402
+
+
+@pytest.fixture
+def app(tmp_path: t.Any, monkeypatch: pytest.MonkeyPatch) -> t.Iterator[t.Any]:
+    """the local app"""
+
+    from a import cache
+
+    monkeypatch.chdir(tmp_path)
+
+    flask_app: t.Any = local.create_app(
+        str(tmp_path),
+        {
+            "TESTING": True,
+            "SESSION_COOKIE_SECURE": False,
+            "REMEMBER_COOKIE_SECURE": False,
+            "CAPTCHA_ENABLED": False,
+            "ARGON2_TIME_COST": 1,
+            "ARGON2_PARALLELISM": 1,
+        },
+    )
+
+    yield flask_app
+
+    cache.store.l1.clear()
+
+
+@pytest.fixture
+def queries() -> t.Iterator[t.List[str]]:
+    """statements run by the test"""
+
+    from a import query
+
+    statements: t.List[str] = []
+    fn: t.Callable[[str, float], None] = query.listen(lambda statement, _: statements.append(statement))
+
+    yield statements
+
+    query.listeners.remove(fn)
+
+
+@pytest.fixture
+def client(app: t.Any) -> t.Any:
+    """test client of the app"""
+    return app.test_client()
+
+
+def user(username: str = "bob", blog: bool = False) -> t.Any:
+    """add a user, and its blog, needs an app context, the rows are cacheable
+    right away"""
+
+    from a import cache, models
+
+    usr: t.Any = models.User(username, "password", "123456")
+    models.db.session.add(usr)
+
+    if blog:
+        models.db.session.add(
+            models.Blog(username, "title", "header", "description", "a,b", "a,b", "#000000", "#ffffff", "en_US")
+        )
+
+    models.db.session.commit()
+    cache.store.l1.clear()
+
+    return usr
+
+
+def sign_in(app: t.Any, client: t.Any, username: str) -> None:
+    """sign `client` in as `username`, the session is bound to the address and
+    user agent of the client"""
+
+    import flask_login  # type: ignore
+
+    with app.test_request_context(environ_base=client.environ_base):
+        identifier: str = flask_login.utils._create_identifier()  # type: ignore
+
+    with client.session_transaction() as session:
+        session["_user_id"] = username
+        session["_fresh"] = True
+        session["_id"] = identifier
+
+
+def post(username: str = "bob", title: str = "hello", content: str = "hello world") -> t.Any:
+    """add a blog post, needs an app context, the rows are cacheable right away"""
+
+    from a import cache, models
+
+    obj: t.Any = models.BlogPost(title, "a,b", content, "description", username)
+    models.add(obj)
+    models.db.session.commit()
+    cache.store.l1.clear()
+
+    return obj
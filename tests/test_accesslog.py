@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""access log tests"""
+
+import json
+import os
+import typing as t
+
+
+def test_rotate(tmp_path: t.Any) -> None:
+    """every line is appended whole and the log is rotated by size"""
+
+    from a import accesslog
+
+    path: str = str(tmp_path / "access.log")
+    log: accesslog.AccessLog = accesslog.AccessLog()
+
+    assert log.setup(path, max_bytes=64, backups=2)
+
+    for idx in range(32):
+        log.write([json.dumps({"idx": idx})])
+
+    assert os.path.exists(f"{path}.1") and os.path.exists(f"{path}.2")
+    assert not os.path.exists(f"{path}.3")
+
+    lines: t.List[str] = []
+
+    for name in (f"{path}.2", f"{path}.1", path):
+        with open(name) as fp:
+            lines += fp.read().splitlines()
+
+    assert [json.loads(line)["idx"] for line in lines] == list(range(32 - len(lines), 32))
+
+
+def test_streamed_bytes(app: t.Any, tmp_path: t.Any) -> None:
+    """streamed responses are logged without a size"""
+
+    import flask
+
+    from a import accesslog, query
+
+    path: str = str(tmp_path / "access.log")
+    log: accesslog.AccessLog = accesslog.AccessLog()
+    listeners: int = len(query.listeners)
+
+    app.config["ACCESS_LOG_FILE"] = path
+    log.init_app(app)
+    app.add_url_rule("/streamed", "streamed", lambda: flask.Response(iter(["a", "b"])))
+    app.add_url_rule("/sized", "sized", lambda: "ab")
+
+    try:
+        client: t.Any = app.test_client()
+
+        assert client.get("/streamed").get_data() == b"ab"
+        assert client.get("/sized").get_data() == b"ab"
+    finally:
+        log.close()
+        del query.listeners[listeners:]
+
+    with open(path) as fp:
+        records: t.List[t.Dict[str, t.Any]] = [json.loads(line) for line in fp]
+
+    assert [(record["path"], record["bytes"]) for record in records] == [
+        ("/streamed", "-"),
+        ("/sized", 2),
+    ]
@@ -0,0 +1,37 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""admin route tests"""
+
+import os
+import typing as t
+
+from conftest import sign_in, user
+
+
+def test_memory(app: t.Any, client: t.Any) -> None:
+    """memory diagnostics are pinned to the worker which started them"""
+
+    from a import const, memory, models
+
+    with app.app_context():
+        user("bob")
+        models.User.query.filter_by(username="bob").first().role = const.Role.admin
+        models.db.session.commit()
+
+    sign_in(app, client, "bob")
+
+    try:
+        assert client.get("/admin/memory").json["pid"] == os.getpid()
+        assert client.get("/admin/memory/diff").status_code == 409
+        assert client.post(f"/admin/memory/snapshot?pid={os.getpid() + 1}").status_code == 409
+        assert client.post(f"/admin/memory/snapshot?pid={os.getpid()}").json["baseline"]
+
+        hoard: t.List[bytes] = [bytes(1024) for _ in range(256)]
+        diff: t.List[t.Dict[str, t.Any]] = client.get("/admin/memory/diff?limit=1000").json["diff"]
+
+        assert any(entry["file"] == __file__ and entry["size_diff"] > 0 for entry in diff)
+        assert not client.post("/admin/memory/stop").json["baseline"]
+
+        del hoard
+    finally:
+        memory.stop()
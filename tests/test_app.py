@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""app level route tests"""
+
+import typing as t
+
+from conftest import post, user
+
+
+def test_feeds(app: t.Any, client: t.Any) -> None:
+    """robots.txt and the sitemap list the users and blogs"""
+
+    with app.app_context():
+        user("alice")
+        user("ari", blog=True)
+        post("ari", "hello")
+
+    robots: str = client.get("/robots.txt").get_data(as_text=True)
+    sitemap: str = client.get("/sitemap.xml").get_data(as_text=True)
+
+    assert "/blog/@ari/sitemap.xml" in robots and "@alice" not in robots
+    assert "/@alice<" in sitemap and "/blog/@ari<" in sitemap
+    assert "/blog/@ari/hello<" in sitemap
@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""microbenchmark script tests"""
+
+import typing as t
+
+import bench
+
+
+def test_fmt() -> None:
+    """durations are shown in the largest unit below them"""
+
+    assert bench.fmt(2) == "2.000 s"
+    assert bench.fmt(0.0015) == "1.500 ms"
+    assert bench.fmt(2e-6) == "2.000 us"
+    assert bench.fmt(5e-9) == "5.0 ns"
+
+
+def test_benchmarks(app: t.Any) -> None:
+    """every benchmark sets up and runs against the populated database"""
+
+    with app.app_context():
+        bench.populate()
+        bench.populate()
+
+        for setup in bench.benchmarks.values():
+            setup()()
+
+        result: t.Dict[str, t.Any] = bench.measure(lambda: None, 3, 0.01)
+
+    assert len(result["runs"]) == 3 and result["min"] <= result["median"]
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""blog route tests"""
+
+import typing as t
+
+import pytest
+
+from conftest import post, sign_in, user
+
+
+def test_blog_pages(app: t.Any, client: t.Any, monkeypatch: pytest.MonkeyPatch) -> None:
+    """the blog index is paginated with an older posts cursor"""
+
+    from a import const
+
+    monkeypatch.setattr(const, "BLOG_PAGE_POSTS", 2)
+
+    with app.app_context():
+        user("bob", blog=True)
+
+        for idx in range(3):
+            post("bob", f"post {idx}")
+
+    first: str = client.get("/blog/@bob").get_data(as_text=True)
+
+    assert "older posts" in first and "@bob/post-0" not in first
+
+    cursor: str = first.split("?before=", 1)[1].split('"', 1)[0]
+    second: str = client.get(f"/blog/@bob?before={cursor}").get_data(as_text=True)
+
+    # the latest post is linked from every page
+
+    assert '<ol reversed start=1> <li><a href="@bob/post-0">' in second
+    assert 'latest post : <a href="@bob/post-2">' in second
+    assert "older posts" not in second
+    assert client.get("/blog/@bob?before=nope").status_code == 400
+
+
+def test_blog_pages_case(app: t.Any, client: t.Any, monkeypatch: pytest.MonkeyPatch) -> None:
+    """pages of a blog spelled in another case are purged with the blog"""
+
+    from a import cache, models
+
+    # sqlite compares usernames case sensitively, unlike the mariadb collation
+
+    cached: t.Callable[..., t.Any] = models.cached
+
+    def fold(model: t.Any, **by: t.Any) -> t.Any:
+        return cached(model, **{k: v.lower() if k == "username" else v for k, v in by.items()})
+
+    monkeypatch.setattr(models, "cached", fold)
+
+    with app.app_context():
+        user("bob", blog=True)
+        post("bob", "first")
+
+    assert "@bob/first" in client.get("/blog/@BOB").get_data(as_text=True)
+
+    with app.app_context():
+        post("bob", "second")
+        cache.blog_purge("bob")
+
+    assert "@bob/second" in client.get("/blog/@BOB").get_data(as_text=True)
+    assert "second" in client.get("/blog/@BOB/rss.xml").get_data(as_text=True)
+    assert client.get("/blog/@BOB/second").status_code == 200
+
+
+def test_visitor(app: t.Any, client: t.Any) -> None:
+    """blog pages are the same for everyone, owner links are fetched separately"""
+
+    with app.app_context():
+        user("bob", blog=True)
+        user("alice")
+        post("bob", "hello")
+
+    anonymous: t.Any = client.get("/blog/@bob/hello")
+
+    assert "public" in anonymous.headers["Cache-Control"]
+    assert "Cookie" not in anonymous.headers.get("Vary", "")
+    assert "~edit" not in anonymous.get_data(as_text=True)
+    assert "owner" not in client.get("/blog/@bob/~visitor?post=hello").json
+
+    sign_in(app, client, "alice")
+
+    assert "owner" not in client.get("/blog/@bob/~visitor?post=hello").json
+
+    sign_in(app, client, "bob")
+
+    assert client.get("/blog/@bob/hello").get_data() == anonymous.get_data()
+
+    parts: t.Dict[str, str] = client.get("/blog/@bob/~visitor?post=hello").json
+
+    assert "/blog/@bob/hello/~edit" in parts["owner"]
+    assert "/blog/@bob/~new" in client.get("/blog/@bob/~visitor").json["owner"]
@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""invalidation bus tests"""
+
+import os
+import socket
+import threading
+import typing as t
+
+
+def test_publish(tmp_path: t.Any) -> None:
+    """keys reach the other workers in batches, dead workers are removed"""
+
+    from a import bus
+
+    hub: bus.Bus = bus.Bus()
+    hub.dir = str(tmp_path)
+
+    peer: socket.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    peer.bind(os.path.join(hub.dir, "1.sock"))
+    peer.settimeout(1)
+
+    dead: socket.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+    dead.bind(os.path.join(hub.dir, "2.sock"))
+    dead.close()
+
+    keys: t.List[str] = [f"l1:page:{idx:04}" for idx in range(1024)]
+    hub.publish(*keys)
+
+    received: t.List[str] = []
+
+    while len(received) < len(keys):
+        data: bytes = peer.recv(bus.MSG_MAX)
+        assert len(data) <= bus.MSG_MAX
+        received += data.decode().split("\n")
+
+    peer.close()
+
+    assert received == keys
+    assert os.listdir(hub.dir) == ["1.sock"]
+
+
+def test_subscribe(tmp_path: t.Any) -> None:
+    """published keys run the subscribers of their prefix"""
+
+    from a import bus
+
+    hub: bus.Bus = bus.Bus()
+    hub.dir = str(tmp_path)
+
+    got: t.List[str] = []
+    done: threading.Event = threading.Event()
+
+    hub.subscribe("l1:", got.append)
+    hub.subscribe("names:", lambda key: done.set())
+    hub.start()
+
+    try:
+        sender: socket.socket = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sender.sendto(b"l1:a\nother:b\nnames:users", hub.path)
+        sender.close()
+
+        assert done.wait(1)
+        assert got == ["l1:a"]
+    finally:
+        hub.stop()
+
+        if hub.sock is not None:
+            hub.sock.close()
@@ -0,0 +1,170 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""cache tests"""
+
+import typing as t
+
+import pylibmc  # type: ignore
+
+from conftest import user
+
+
+def test_key_multibyte() -> None:
+    """keys are limited in bytes, not characters"""
+
+    from a import cache
+
+    key: str = "neg:post:bob:" + "é" * 150
+
+    assert len(key) <= cache.KEY_MAX
+    assert cache.Cache.key(key).startswith("h:")
+    assert len(cache.Cache.key(key).encode()) <= 250
+    assert cache.Cache.key("neg:post:bob:hello") == "neg:post:bob:hello"
+
+
+def test_l2_client_errors_miss() -> None:
+    """errors raised by the client before sending are misses"""
+
+    from a import cache
+
+    store: cache.Cache = cache.Cache()
+    store.pool = pylibmc.ThreadMappedPool(pylibmc.Client(["127.0.0.1:1"], binary=True))
+
+    def bad(_: t.Any) -> None:
+        raise ValueError("key length 300 too long, max is 250")
+
+    assert store.l2(bad) is cache.MISS
+    assert not store.breaker.failures
+
+
+def test_long_multibyte_slug(app: t.Any, client: t.Any) -> None:
+    """a long multibyte slug is a 404 with memcached configured"""
+
+    from a import cache
+
+    with app.app_context():
+        user("bob", blog=True)
+
+    cache.store.pool = pylibmc.ThreadMappedPool(
+        pylibmc.Client(["127.0.0.1:1"], binary=True)
+    )
+
+    try:
+        assert client.get(f"/blog/@bob/{'é' * 150}").status_code == 404
+    finally:
+        cache.store.pool = None
+
+
+def test_snapshot(tmp_path: t.Any) -> None:
+    """snapshots keep coalesced values for the rest of their timeout, and never
+    version stamps"""
+
+    import time
+
+    from a import cache
+
+    store: cache.Cache = cache.Cache()
+    store.l1 = cache.LRU(16)
+    store.snapshot_dir = str(tmp_path)
+    store.snapshot_prefixes = ("page:", "feed:", "ver:")
+
+    store.put("page:new", "new", 60)
+    store.put("page:old", "old", 60)
+    store.l1.set("page:old", (time.time() - store.stale_timeout - 1, "old"), 60)
+    store.set("ver:user:bob", "version", 0)
+
+    assert store.save() == 2
+
+    store.l1 = cache.LRU(16)
+
+    assert store.restore() == 1
+    assert store.peek("page:new") == ("new", True)
+    assert store.peek("page:old")[0] is cache.MISS
+    assert store.get("ver:user:bob") is None
+
+    expiry: float = store.l1.items["page:new"][0] - time.monotonic()
+    assert 60 + store.stale_timeout - 2 < expiry <= 60 + store.stale_timeout
+
+
+def test_breaker_half_open(monkeypatch: t.Any) -> None:
+    """an open breaker lets a single trial through after the cooldown"""
+
+    from a import cache
+
+    now: t.List[float] = [0]
+    monkeypatch.setattr(cache, "monotonic", lambda: now[0])
+
+    breaker: cache.Breaker = cache.Breaker(threshold=2, cooldown=10)
+
+    breaker.failure()
+    assert breaker.allow()
+    breaker.failure()
+    assert breaker.open and not breaker.allow()
+
+    now[0] = 11
+    assert breaker.allow() and not breaker.allow()
+
+    breaker.failure()
+    assert not breaker.allow()
+
+    now[0] = 22
+    assert breaker.allow()
+    breaker.abort()
+    assert breaker.open and not breaker.allow()
+
+    now[0] = 33
+    assert breaker.allow()
+    breaker.success()
+    assert not breaker.open and breaker.allow() and breaker.allow()
+
+
+def test_coalesce() -> None:
+    """one caller computes a key, the others wait for it or get it stale"""
+
+    import threading
+
+    from a import cache
+
+    store: cache.Cache = cache.Cache()
+    store.l1 = cache.LRU(16)
+
+    started: threading.Event = threading.Event()
+    finish: threading.Event = threading.Event()
+    calls: t.List[int] = []
+    results: t.List[t.Any] = []
+
+    def slow() -> str:
+        calls.append(1)
+        started.set()
+        finish.wait(5)
+        return "value"
+
+    leader: threading.Thread = threading.Thread(
+        target=lambda: results.append(store.coalesce("page:key", slow))
+    )
+    leader.start()
+    started.wait(5)
+
+    follower: threading.Thread = threading.Thread(
+        target=lambda: results.append(store.coalesce("page:key", slow))
+    )
+    follower.start()
+    finish.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert results == ["value", "value"] and len(calls) == 1
+    assert not store.flights.locks
+
+    # a stale value is served while someone else holds the key
+
+    store.put("page:key", "stale", 0)
+    assert store.acquire("page:key")
+
+    try:
+        assert store.coalesce("page:key", slow) == "stale"
+    finally:
+        store.release("page:key")
+
+    assert store.coalesce("page:key", lambda: "fresh") == "fresh"
+    assert len(calls) == 1
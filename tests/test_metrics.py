@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""metrics tests"""
+
+import typing as t
+
+
+def test_metrics(app: t.Any, client: t.Any) -> None:
+    """metrics need the bearer token and count the requests by endpoint"""
+
+    token: str = app.config["METRICS_TOKEN"].decode()
+
+    assert client.get("/robots.txt").status_code == 200
+    assert client.get("/metrics").status_code == 403
+    assert client.get("/metrics", headers={"Authorization": "Bearer nope"}).status_code == 403
+
+    response: t.Any = client.get("/metrics", headers={"Authorization": f"Bearer {token}"})
+    body: str = response.get_data(as_text=True)
+
+    assert response.status_code == 200
+    assert 'a_http_requests_total{endpoint="metrics",method="GET",status="403"}' in body
+    assert 'a_http_request_seconds_count{endpoint="__robots__",method="GET"}' in body
+    assert "a_http_requests_in_flight" in body
@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""model tests"""
+
+import typing as t
+
+from sqlalchemy import inspect
+
+from conftest import post, user
+
+
+def test_user_blog_joined(app: t.Any, queries: t.List[str]) -> None:
+    """the blog is joined into the user query, and both rows are cached"""
+
+    from a import models
+
+    with app.app_context():
+        user("bob", blog=True)
+
+    with app.test_request_context():
+        queries.clear()
+        usr: t.Any = models.User.get_by_user("bob", blog=True)
+
+        assert len(queries) == 1 and " JOIN " in queries[0]
+        assert "blog" in inspect(usr).dict and usr.blog.username == "bob"
+
+    with app.test_request_context():
+        queries.clear()
+        usr = models.User.get_by_user("bob", blog=True)
+
+        assert usr.blog.username == "bob"
+        assert not queries
+
+
+def test_user_blog_memoised(app: t.Any, queries: t.List[str]) -> None:
+    """a user memoised without its blog gets it attached when asked for"""
+
+    from a import models
+
+    with app.app_context():
+        user("bob", blog=True)
+
+    with app.test_request_context():
+        usr: t.Any = models.User.get_by_user("bob")
+
+        assert "blog" not in inspect(usr).dict
+        assert models.User.get_by_user("bob", blog=True) is usr
+        assert "blog" in inspect(usr).dict
+
+        queries.clear()
+        assert usr.blog.username == "bob"
+        assert not queries
+
+
+def test_user_without_blog(app: t.Any) -> None:
+    """users without a blog load with an empty blog"""
+
+    from a import models
+
+    with app.app_context():
+        user("bob")
+
+    with app.test_request_context():
+        usr: t.Any = models.User.get_by_user("bob", blog=True)
+        assert usr is not None and usr.blog is None
+
+
+def test_row_cache_private(app: t.Any, queries: t.List[str]) -> None:
+    """credentials are not cached, and load when they are needed"""
+
+    from a import cache, models
+
+    with app.app_context():
+        user("bob")
+
+    with app.test_request_context():
+        models.cached(models.User, username="bob")
+
+    values: t.Any = cache.store.get(models.row_key(models.User, {"username": "bob"}))
+
+    assert values["username"] == "bob"
+    assert "password_hash" not in values and "pin_hash" not in values
+
+    with app.test_request_context():
+        queries.clear()
+        usr: t.Any = models.cached(models.User, username="bob")
+
+        assert not queries
+        assert usr.verify_password("password") and usr.verify_pin("123456")
+
+
+def test_row_cache_stale_read(app: t.Any) -> None:
+    """a row read before another request commits a change is not cached after"""
+
+    from a import cache, const, models
+
+    with app.app_context():
+        user("bob")
+
+    key: str = models.row_key(models.User, {"username": "bob"})
+
+    with app.test_request_context():
+        old: t.Any = models.User.query.filter_by(username="bob").first()
+
+        # another request changes the user and commits
+
+        with app.app_context():
+            usr: t.Any = models.db.session.get(models.User, "bob")
+            usr.role = const.Role.admin
+            models.db.session.commit()
+
+        models.row_set(old, ("username",))
+
+    assert cache.store.get(key) == "-"
+
+    with app.test_request_context():
+        assert models.cached(models.User, username="bob").role == const.Role.admin
+
+
+def test_row_cache_savepoint(app: t.Any) -> None:
+    """a rolled back savepoint keeps the rows of its transaction held"""
+
+    import pytest
+    from sqlalchemy.exc import IntegrityError
+
+    from a import cache, models
+
+    with app.app_context():
+        user("bob")
+
+    with app.test_request_context():
+        usr: t.Any = models.db.session.get(models.User, "bob")
+        usr.bio = "changed"
+        models.db.session.flush()
+
+        with pytest.raises(IntegrityError):
+            with models.db.session.begin_nested():
+                models.db.session.execute(
+                    models.User.__table__.insert(),
+                    [{"username": "bob", "password_hash": "", "pin_hash": ""}],
+                )
+
+        assert models.db.session.info["rows"]
+
+        models.db.session.commit()
+
+    assert cache.store.get(models.row_key(models.User, {"username": "bob"})) == "-"
+
+
+def test_user_snapshot(app: t.Any) -> None:
+    """a session snapshot is trusted until its user changes"""
+
+    from a import const, models
+
+    with app.app_context():
+        user("bob")
+
+    with app.test_request_context():
+        usr: t.Any = models.User.get_by_user("bob")
+        models.UserSnapshot.save(usr)
+
+        snapshot: t.Any = models.UserSnapshot.load("bob")
+
+        assert snapshot is not None and snapshot.role == const.Role.user
+        assert models.UserSnapshot.load("alice") is None
+
+        usr.role = const.Role.admin
+        models.db.session.commit()
+
+        assert models.UserSnapshot.load("bob") is None
+
+
+def test_user_snapshot_savepoint(app: t.Any) -> None:
+    """a rolled back savepoint keeps the users of its transaction outdated"""
+
+    import pytest
+    from sqlalchemy.exc import IntegrityError
+
+    from a import cache, models
+
+    with app.app_context():
+        user("bob")
+
+    with app.test_request_context():
+        usr: t.Any = models.db.session.get(models.User, "bob")
+        usr.bio = "changed"
+        models.db.session.flush()
+
+        version: t.Optional[str] = cache.user_version("bob")
+
+        with pytest.raises(IntegrityError):
+            with models.db.session.begin_nested():
+                models.db.session.execute(
+                    models.User.__table__.insert(),
+                    [{"username": "bob", "password_hash": "", "pin_hash": ""}],
+                )
+
+        assert models.db.session.info["users"] == {"bob"}
+
+        models.db.session.commit()
+
+        assert cache.user_version("bob") != version
+
+
+def test_add_id_collision(app: t.Any) -> None:
+    """a colliding id is retried with a new one, other collisions are not"""
+
+    import pytest
+    from sqlalchemy.exc import IntegrityError
+
+    from a import models
+
+    with app.app_context():
+        user("bob", blog=True)
+        first: t.Any = post("bob", "first")
+        first_id: str = first.id
+
+        # the colliding row is not in the session, as it would be in a request
+
+        models.db.session.expunge_all()
+
+        obj: t.Any = models.BlogPost("second", "a,b", "content", "description", "bob")
+        obj.id = first_id
+        models.add(obj)
+        models.db.session.commit()
+
+        assert obj.id != first_id and obj.slug == "second"
+
+        obj = models.BlogPost("third", "a,b", "content", "description", "bob")
+        obj.slug = "first"
+
+        with pytest.raises(IntegrityError):
+            models.add(obj)
+
+
+def test_post_summaries(app: t.Any, queries: t.List[str]) -> None:
+    """summaries are the newest posts first, without content or session state"""
+
+    from a import models
+
+    with app.app_context():
+        user("bob", blog=True)
+        post("bob", "first")
+        post("bob", "second")
+
+    with app.test_request_context():
+        queries.clear()
+        summaries: t.List[models.PostSummary] = models.PostSummary.of("bob")
+
+        assert [summary.slug for summary in summaries] == ["second", "first"]
+        assert len(queries) == 1 and "content" not in queries[0]
+        assert not models.db.session.identity_map
+        assert models.PostSummary.count("bob") == 2
+
+
+def test_post_summaries_keyset(app: t.Any) -> None:
+    """cursors page through posts posted at the same time without gaps"""
+
+    from datetime import datetime
+
+    from a import models
+
+    with app.app_context():
+        user("bob", blog=True)
+
+        for idx in range(5):
+            post("bob", f"post {idx}").posted = datetime(2020, 1, 1)
+
+        models.db.session.commit()
+
+    with app.app_context():
+        seen: t.List[str] = []
+        before: t.Optional[t.Tuple[datetime, str]] = None
+
+        while page := models.PostSummary.of("bob", 2, before):
+            seen.extend(summary.slug for summary in page)
+            before = models.PostSummary.parse_cursor(page[-1].cursor)
+
+        assert sorted(seen) == [f"post-{idx}" for idx in range(5)]
+        assert models.PostSummary.count("bob", before) == 0
+
+
+def test_parse_cursor() -> None:
+    """cursors round trip, and anything else is rejected"""
+
+    from datetime import datetime
+
+    from a import models
+
+    summary: models.PostSummary = models.PostSummary(
+        "id-_9", "slug", "title", "description", datetime(2020, 1, 2, 3, 4, 5, 6), datetime.now(), "bob"
+    )
+
+    assert models.PostSummary.parse_cursor(summary.cursor) == (datetime(2020, 1, 2, 3, 4, 5, 6), "id-_9")
+    assert models.PostSummary.parse_cursor("20201301000000000000-id") is None
+    assert models.PostSummary.parse_cursor("2020-id") is None
+    assert models.PostSummary.parse_cursor(summary.cursor + " ") is None
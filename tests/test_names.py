@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""existence filter and negative lookup tests"""
+
+import typing as t
+
+from conftest import user
+
+
+def test_fold() -> None:
+    """names equal under the collation fold the same"""
+
+    from a import names
+
+    assert names.fold("BOB") == names.fold("bob") == "bob"
+    assert names.fold("Élan ") == names.fold("elan")
+    assert names.fold("straße") == names.fold("STRASSE")
+
+
+def test_absent(monkeypatch: t.Any) -> None:
+    """only names missing from a trusted generation are absent"""
+
+    from a import cache, names
+
+    known: t.List[str] = ["Bob", "élan"]
+    existing: names.Names = names.Names("test", lambda: known)
+
+    monkeypatch.setattr(existing, "generation", lambda: cache.MISS)
+    assert not existing.absent("carol")
+
+    monkeypatch.setattr(existing, "generation", lambda: "one")
+    existing.expire()
+
+    assert not existing.absent("bob") and not existing.absent("ELAN")
+    assert existing.absent("carol")
+
+    known.append("carol")
+    assert existing.absent("carol")
+
+    monkeypatch.setattr(existing, "generation", lambda: "two")
+    existing.expire()
+
+    assert not existing.absent("carol")
+
+
+def test_negative_post(app: t.Any, client: t.Any) -> None:
+    """a missing post is remembered until it is created"""
+
+    from a import models, names
+
+    with app.app_context():
+        user("bob", blog=True)
+
+    assert client.get("/blog/@bob/hello").status_code == 404
+
+    # not `post`, which drops the cache
+
+    with app.app_context():
+        models.add(models.BlogPost("hello", "a,b", "content", "description", "bob"))
+        models.db.session.commit()
+
+    assert client.get("/blog/@bob/hello").status_code == 404
+
+    with app.app_context():
+        names.forget("post:bob:hello")
+
+    assert client.get("/blog/@bob/hello").status_code == 200
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""slow request profiler tests"""
+
+import time
+import typing as t
+
+import flask
+
+
+def test_slow_request(tmp_path: t.Any) -> None:
+    """slow requests are saved as collapsed stacks, fast ones are not"""
+
+    from a import profiler
+
+    app: flask.Flask = flask.Flask(__name__)
+    app.config.update(
+        PROFILE_DIR=str(tmp_path),
+        PROFILE_THRESHOLD=0.1,
+        PROFILE_DELAY=0,
+        PROFILE_INTERVAL=0.005,
+        PROFILE_KEEP=1,
+    )
+
+    @app.get("/slow/<int:n>")
+    def slow_view(n: int) -> str:
+        time.sleep(0.2)
+        return str(n)
+
+    @app.get("/fast")
+    def fast_view() -> str:
+        return "fast"
+
+    prof: profiler.Profiler = profiler.Profiler()
+    prof.init_app(app)
+
+    client: t.Any = app.test_client()
+    client.get("/fast")
+
+    assert not prof.profiles()
+
+    client.get("/slow/1")
+    time.sleep(1)  # names are stamped by the second
+    client.get("/slow/2")
+
+    names: t.List[str] = prof.profiles()
+
+    assert len(names) == 1 and names[0].endswith("ms-GET_slow_2.folded")
+    assert "slow_view (test_profiler.py)" in (prof.read(names[0]) or "")
+    assert prof.read("../escape.folded") is None
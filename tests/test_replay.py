@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""traffic replay script tests"""
+
+import random
+import typing as t
+
+import pytest
+import replay
+import scale
+
+
+def test_app(tmp_path: t.Any, monkeypatch: pytest.MonkeyPatch) -> None:
+    """the replay app skips the captcha without running in debug mode"""
+
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setenv("REPLAY_DIR", str(tmp_path))
+    monkeypatch.setenv("REPLAY_CACHE", "memory")
+    monkeypatch.delenv("REPLAY_DATABASE", raising=False)
+
+    app: t.Any = replay.app()
+
+    assert not app.debug and not app.config["CAPTCHA_ENABLED"]
+
+    with app.app_context():
+        scale.generate(4, random.Random(0))
+
+    client: t.Any = app.test_client()
+    route, path, form = replay.Client("", {"password": scale.PASSWORD, "pin": scale.PIN}, random.Random(0)).login(
+        "scale000001"
+    )
+
+    assert route == "POST /auth/signin"
+
+    response: t.Any = client.post(path, data=form)
+
+    assert response.status_code == 302 and response.headers["Location"] == "/"
+
+
+def test_actions() -> None:
+    """synthetic actions are built from the targets"""
+
+    targets: t.Dict[str, t.Any] = {
+        "password": "password",
+        "pin": "123456",
+        "users": ["bob"],
+        "blogs": {"bob": ["hello"]},
+        "counters": [["bob", "id"]],
+    }
+
+    client: replay.Client = replay.Client("", targets, random.Random(0))
+
+    assert client.actions("counter") == [("/counter/@<user>/<id>.svg", "/counter/@bob/id.svg", None)]
+    assert client.actions("post") == [("/blog/@<user>/<slug>", "/blog/@bob/hello", None)]
+    assert [route for route, _, _ in client.actions("preview")] == [
+        "POST /auth/signin",
+        "POST /blog/@<user>/~new/preview",
+        "/blog/~preview",
+    ]
+
+    with pytest.raises(ValueError):
+        client.actions("nothing")
+
+
+def test_percentile() -> None:
+    """nearest rank percentiles"""
+
+    values: t.List[float] = [float(n) for n in range(1, 101)]
+
+    assert replay.percentile(values, 50) == 51
+    assert replay.percentile(values, 100) == 100
@@ -0,0 +1,33 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""scaling test script tests"""
+
+import random
+import typing as t
+
+import scale
+
+
+def test_slope() -> None:
+    """the slope is the exponent of a power law"""
+
+    xs: t.List[float] = [1, 2, 4, 8]
+
+    assert abs(scale.slope(xs, [x**2 for x in xs]) - 2) < 1e-9
+    assert abs(scale.slope(xs, [3.0 for _ in xs])) < 1e-9
+    assert scale.slope([4, 4], [1, 2]) == 0
+
+
+def test_generate(app: t.Any) -> None:
+    """steps grow the data, and measuring warms up and times every route"""
+
+    with app.app_context():
+        scale.generate(4, random.Random(0))
+        sizes: t.Dict[str, int] = scale.generate(8, random.Random(0))
+
+    assert sizes == {"users": 8, "blogs": 2, "posts": 16, "counters": 64}
+
+    results: t.Dict[str, t.Dict[str, float]] = scale.measure(app, 1)
+
+    assert set(results) == set(scale.ROUTES)
+    assert all(result["status"] == 200 for result in results.values())
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""schema migration and index check tests"""
+
+import typing as t
+
+import pytest
+
+
+def test_check(app: t.Any) -> None:
+    """every hot query uses one of its indexes"""
+
+    from a import models, schema
+
+    with app.app_context():
+        assert schema.check(models.db.engine) == []
+
+
+def test_migrate(app: t.Any) -> None:
+    """missing indexes are created, unless their rows are not unique"""
+
+    from a import models, schema
+
+    with app.app_context():
+        engine: t.Any = models.db.engine
+
+        assert schema.migrate(engine) == []
+
+        with engine.begin() as conn:
+            conn.exec_driver_sql("DROP INDEX ix_blog_post_username_posted")
+            conn.exec_driver_sql("DROP INDEX ix_blog_post_username_slug")
+
+        failures: t.List[str] = schema.check(engine)
+
+        assert len(failures) == 2 and failures[0].startswith("posts of a blog, newest first : ")
+
+        with engine.begin() as conn:
+            conn.exec_driver_sql(
+                "INSERT INTO blog_post (id, slug, title, keywords, content, description, posted, edited, username) "
+                "VALUES ('1', 'same', '', '', '', '', '2000-01-01', '2000-01-01', 'bob'), "
+                "('2', 'same', '', '', '', '', '2000-01-01', '2000-01-01', 'bob')"
+            )
+
+        with pytest.raises(RuntimeError, match="cannot create ix_blog_post_username_slug"):
+            schema.migrate(engine)
+
+        with engine.begin() as conn:
+            conn.exec_driver_sql("DELETE FROM blog_post WHERE id = '2'")
+
+        # the other index may have been created before the failure
+
+        assert "created ix_blog_post_username_slug" in schema.migrate(engine)
+        assert schema.check(engine) == []
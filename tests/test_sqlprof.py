@@ -0,0 +1,55 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""sql profiler tests"""
+
+import typing as t
+
+
+def test_fingerprint() -> None:
+    """statements only differing in values share a fingerprint"""
+
+    from a import sqlprof
+
+    assert sqlprof.fingerprint(
+        "SELECT * FROM user\n  WHERE username = 'o''brien' AND id IN (1, 2, 3)"
+    ) == "SELECT * FROM user WHERE username = ? AND id IN (?+)"
+    assert sqlprof.fingerprint("SELECT 1 FROM blog WHERE username = ?") == sqlprof.fingerprint(
+        "SELECT 2 FROM blog WHERE username = %(username)s"
+    )
+    assert sqlprof.fingerprint("SELECT t1.x FROM t1") == "SELECT t1.x FROM t1"
+
+
+def test_profile() -> None:
+    """repeated statements are found, the slowest are the worst"""
+
+    from a import sqlprof
+
+    profile: sqlprof.Profile = sqlprof.Profile()
+
+    for idx in range(6):
+        profile.add(f"SELECT * FROM post WHERE id = {idx}", 0.001)
+
+    profile.add("SELECT * FROM blog", 0.5)
+
+    assert profile.count == 7 and round(profile.seconds, 6) == 0.506
+    assert [fp for fp, _ in profile.repeated(5)] == ["SELECT * FROM post WHERE id = ?"]
+    assert [fp for fp, _ in profile.worst(1)] == ["SELECT * FROM blog"]
+
+
+def test_header(app: t.Any, client: t.Any) -> None:
+    """debug responses carry a summary of their statements"""
+
+    from a import query, sqlprof
+
+    listeners: int = len(query.listeners)
+
+    app.config["SQLPROF_ENABLED"] = True
+    app.debug = True
+    sqlprof.init_app(app)
+
+    try:
+        header: str = client.get("/@nobody").headers.get("X-SQL-Profile", "")
+    finally:
+        del query.listeners[listeners:]
+
+    assert header.startswith("queries=") and "; repeated=0" in header
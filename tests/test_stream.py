@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""streaming tests"""
+
+import typing as t
+
+import web_mini
+
+from conftest import post, user
+
+DOCUMENT: t.Final[str] = """<!doctype html>
+<html>
+  <head>
+    <title> streamed </title>
+    <style>
+      body  { color : red ; }
+    </style>
+  </head>
+  <body>
+    <!-- a comment with > <b> tags </b> -->
+    <p>  some   text  <b> bold </b> </p>
+    <pre>
+  keep   this >
+    <i> as is </i>
+    </pre>
+    <table>
+      <tbody> <tr> <td> cell </td> </tr> </tbody>
+    </table>
+    <script>
+      if (a > b) { c = "<p>  </p>" ; }
+    </script>
+    <textarea>  raw
+  text </textarea>
+  </body>
+</html>
+"""
+
+
+def test_minify_chunks() -> None:
+    """minifying a stream in any chunking matches minifying the whole document"""
+
+    from a import stream
+
+    whole: str = web_mini.html.minify_html(DOCUMENT)
+
+    for step in (1, 7, 64, len(DOCUMENT)):
+        chunks: t.List[str] = [DOCUMENT[idx: idx + step] for idx in range(0, len(DOCUMENT), step)]
+
+        for size in (1, 32, 4096):
+            assert "".join(stream.minify(chunks, size)) == whole, (step, size)
+
+
+def test_streamed_post(app: t.Any, client: t.Any, monkeypatch: t.Any) -> None:
+    """a long post is streamed minified, and served from the cache afterwards"""
+
+    from a import const
+
+    monkeypatch.setattr(const, "BLOG_STREAM_CONTENT", 16)
+
+    with app.app_context():
+        user("bob", blog=True)
+        post("bob", "long", "a long post\n\n" * 64)
+
+    with client.get("/blog/@bob/long") as response:
+        assert "Content-Length" not in response.headers
+        body: bytes = response.get_data()
+
+    with client.get("/blog/@bob/long") as response:
+        assert "Content-Length" in response.headers
+        assert response.get_data() == body
+
+    assert body.count(b"a long post") == 64
+    assert web_mini.html.minify_html(body.decode()) == body.decode()
@@ -0,0 +1,38 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""system information tests"""
+
+import typing as t
+
+
+def test_size() -> None:
+    """sizes are scaled to the largest unit below 1024"""
+
+    from a import sysinfo
+
+    assert sysinfo.size(0) == "0.0 b"
+    assert sysinfo.size(1536) == "1.5 kb"
+    assert sysinfo.size(3 * 2**30) == "3.0 gb"
+    assert sysinfo.size(2**60) == "1024.0 pb"
+
+
+def test_sample(app: t.Any, monkeypatch: t.Any) -> None:
+    """a snapshot is sampled once per interval and shared, parts which cannot be
+    read are unavailable"""
+
+    from a import sysinfo
+
+    samples: t.List[t.Dict[str, str]] = []
+    sample: t.Callable[[], t.Dict[str, str]] = sysinfo.sampler.sample
+
+    monkeypatch.setattr(sysinfo.sampler, "sample", lambda: samples.append(sample()) or samples[-1])
+
+    with app.test_request_context():
+        first: t.Dict[str, str] = sysinfo.sampler.get()
+
+        assert sysinfo.sampler.get() == first
+
+    assert len(samples) == 1
+    assert set(first) == {"mem", "disk", "db", "loadavg", "cpu", "net", "date"}
+    assert first["db"] == "unavailable"  # sqlite has no information_schema
+    assert first["mem"].startswith("mem  : total ")
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""request tracing tests"""
+
+import typing as t
+
+
+def test_span() -> None:
+    """spans are only recorded while tracing"""
+
+    from a import trace
+
+    with trace.span("outside"):
+        pass
+
+    token: t.Any = trace.spans.set([])
+
+    try:
+        with trace.span("block"):
+            pass
+
+        trace.traced("fn")(lambda: None)()
+        trace.traced("fn")(lambda: None)()
+
+        assert {name: count for name, (count, _) in trace.summary(trace.spans.get() or []).items()} == {
+            "block": 1,
+            "fn": 2,
+        }
+    finally:
+        trace.spans.reset(token)
+
+
+def test_server_timing(app: t.Any, client: t.Any) -> None:
+    """debug responses report the spans of their request"""
+
+    from a import query, trace
+
+    listeners: int = len(query.listeners)
+
+    app.config["TRACE_ENABLED"] = True
+    app.debug = True
+    trace.init_app(app)
+
+    try:
+        header: str = client.get("/").headers.get("Server-Timing", "")
+    finally:
+        del query.listeners[listeners:]
+
+    names: t.List[str] = [part.split(";", 1)[0] for part in header.split(", ")]
+
+    assert "render" in names and names[-1] == "total"
@@ -0,0 +1,40 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""cache warm-up tests"""
+
+import typing as t
+
+from conftest import post, user
+
+
+def test_targets(app: t.Any) -> None:
+    """the feeds, the blogs with the most posts and the latest posts are warmed"""
+
+    from a import warm
+
+    with app.app_context():
+        user("bob", blog=True)
+        post("bob", "first")
+        post("bob", "second")
+
+    with app.test_request_context():
+        paths: t.List[str] = warm.targets()
+
+    assert paths[:2] == ["/robots.txt", "/sitemap.xml"]
+    assert "/blog/@bob" in paths and "/blog/@bob/rss.xml" in paths
+    assert "/blog/@bob/first" in paths and "/blog/@bob/second" in paths
+
+
+def test_warm(app: t.Any) -> None:
+    """every target renders, and a second warm-up waits for the lease"""
+
+    from a import warm
+
+    with app.app_context():
+        user("bob", blog=True)
+        post("bob", "first")
+
+    stats: t.Dict[str, int] = warm.warm(app)
+
+    assert stats["rendered"] and not stats["failed"]
+    assert warm.warm(app) == {"restored": 0, "rendered": 0, "failed": 0}
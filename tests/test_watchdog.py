@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""memory watchdog tests"""
+
+import os
+import signal
+import typing as t
+
+import flask
+import pytest
+
+
+def watchdog(monkeypatch: pytest.MonkeyPatch, samples: t.List[int]) -> t.Any:
+    """a watchdog with a soft limit of 100 bytes seeing `samples` as its rss,
+    it stops with `IndexError` after the last sample"""
+
+    from a import memory, watchdog
+
+    app: flask.Flask = flask.Flask(__name__)
+    app.config.update(WATCHDOG_SOFT_LIMIT=100, WATCHDOG_INTERVAL=0)
+
+    dog: t.Any = watchdog.Watchdog()
+    dog.init_app(app)
+
+    monkeypatch.setattr(memory, "rss", lambda: samples.pop(0))
+
+    return dog
+
+
+def test_log_once(monkeypatch: pytest.MonkeyPatch, caplog: pytest.LogCaptureFixture) -> None:
+    """outside of gunicorn every crossing of the limit is logged once"""
+
+    dog: t.Any = watchdog(monkeypatch, [200, 200, 50, 200, 200])
+
+    with pytest.raises(IndexError):
+        dog.run()
+
+    assert len([r for r in caplog.records if "over the soft limit" in r.message]) == 2
+
+
+def test_recycle(monkeypatch: pytest.MonkeyPatch) -> None:
+    """under gunicorn a worker over the limit terminates itself"""
+
+    kills: t.List[t.Tuple[int, int]] = []
+
+    dog: t.Any = watchdog(monkeypatch, [50, 200])
+    dog.recycle = True
+
+    monkeypatch.setattr(os, "kill", lambda pid, sig: kills.append((pid, sig)))
+    dog.run()
+
+    assert kills == [(os.getpid(), signal.SIGTERM)]